@@ -0,0 +1,257 @@
+# embeddings.py (v1 - Shared Batched Embedding Model)
+
+import os
+import re
+import sqlite3
+import hashlib
+import logging
+from typing import List
+from collections import OrderedDict
+
+import numpy as np
+import requests
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_BATCH_SIZE = 256
+GPU_EMBEDDING_BATCH_SIZE = 512
+CPU_EMBEDDING_BATCH_SIZE = 64
+ONNX_QUANTIZED_FILE = "model_optimized_quantized.onnx"
+SQLITE_BATCH_SIZE = 500
+QUERY_CACHE_SIZE = 256
+
+
+class InfinityEmbeddings(Embeddings):
+    """
+    Client for an Infinity embedding server (michaelfeil/infinity), which runs the
+    encoder with fp16 and dynamic batching. Speaks its OpenAI-style /embeddings API.
+    """
+    def __init__(self, base_url, model_name=f"sentence-transformers/{EMBEDDING_MODEL_NAME}", timeout=120):
+        self.url = base_url.rstrip("/") + "/embeddings"
+        self.model_name = model_name
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        response = self.session.post(
+            self.url,
+            json={"input": texts, "model": self.model_name},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            vectors.extend(self._embed(texts[start:start + EMBEDDING_BATCH_SIZE]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+
+def export_quantized_onnx_model(model_id, output_dir):
+    """
+    Exports the encoder to ONNX, applies graph optimizations and dynamic INT8
+    quantization (VNNI kernels), and saves the result with its tokenizer.
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTOptimizer, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig, OptimizationConfig
+    from transformers import AutoTokenizer
+
+    logging.info(f"Exporting {model_id} to a quantized ONNX model in {output_dir}...")
+    model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+    ORTOptimizer.from_pretrained(model).optimize(
+        save_dir=output_dir,
+        optimization_config=OptimizationConfig(optimization_level=99)
+    )
+    ORTQuantizer.from_pretrained(output_dir, file_name="model_optimized.onnx").quantize(
+        save_dir=output_dir,
+        quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    )
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(output_dir)
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Runs an INT8-quantized ONNX export of the encoder on ONNX Runtime, with the
+    same mean pooling and normalization as sentence-transformers.
+    """
+    def __init__(self, model_dir, max_length=256):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(model_dir, file_name=ONNX_QUANTIZED_FILE)
+        self.max_length = max_length
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        inputs = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        hidden = np.asarray(self.model(**inputs).last_hidden_state, dtype=np.float32)
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = [self._embed(texts[start:start + EMBEDDING_BATCH_SIZE])
+                   for start in range(0, len(texts), EMBEDDING_BATCH_SIZE)]
+        return np.concatenate(batches).tolist() if batches else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model with an on-disk SQLite cache keyed by a hash of the
+    text, so chunks embedded by a previous run skip the encoder entirely.
+    Each model gets its own database under `cache_dir/embeddings/`.
+    Query embeddings are kept in an in-process LRU cache, so repeated searches
+    for the same query run the encoder once; `embed_queries` embeds a batch of
+    queries with one encoder call for all the cache misses.
+    """
+    def __init__(self, model, model_name, cache_dir, ignore_cache=False):
+        self.model = model
+        self.model_name = model_name
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.cache_path = os.path.join(cache_dir, "embeddings", f"{safe_name}.sqlite")
+        self.ignore_cache = ignore_cache
+        self._conn = None
+        self._query_cache = OrderedDict()  # query text -> vector, least recently used first
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256((self.model_name + "\x00" + text).encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.cache_path)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vec BLOB NOT NULL)")
+        return self._conn
+
+    def _lookup(self, keys: List[str]) -> dict:
+        """Fetches the cached vectors for the given hashes, in batches below SQLite's variable limit."""
+        conn = self._connect()
+        found = {}
+        for start in range(0, len(keys), SQLITE_BATCH_SIZE):
+            batch = keys[start:start + SQLITE_BATCH_SIZE]
+            rows = conn.execute(
+                f"SELECT hash, vec FROM embeddings WHERE hash IN ({','.join('?' * len(batch))})", batch
+            )
+            found.update((key, np.frombuffer(blob, dtype=np.float32)) for key, blob in rows)
+        return found
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        cache = {} if self.ignore_cache else self._lookup(list(set(keys)))
+        misses = {}
+        for key, text in zip(keys, texts):
+            if key not in cache:
+                misses.setdefault(key, text)
+
+        if misses:
+            vectors = self.model.embed_documents(list(misses.values()))
+            rows = []
+            for key, vector in zip(misses, vectors):
+                cache[key] = np.asarray(vector, dtype=np.float32)
+                rows.append((key, cache[key].tobytes()))
+            with self._connect() as conn:
+                conn.executemany("INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)", rows)
+        logging.info(f"Embedding cache: {len(texts) - len(misses)} hits, {len(misses)} texts embedded.")
+
+        return [cache[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        if text not in self._query_cache:
+            self._query_cache[text] = tuple(self.model.embed_query(text))
+        return self._use_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds search queries, sending every query missing from the LRU cache to the
+        model in a single `embed_documents` call. Like `embed_query`, this skips the
+        on-disk cache.
+        """
+        misses = list(dict.fromkeys(text for text in texts if text not in self._query_cache))
+        if misses:
+            for text, vector in zip(misses, self.model.embed_documents(misses)):
+                self._query_cache[text] = tuple(vector)
+        return self._use_queries(texts)
+
+    def _use_queries(self, texts: List[str]) -> List[List[float]]:
+        """Returns the cached query vectors, marking them most recently used, then trims the cache."""
+        vectors = []
+        for text in texts:
+            self._query_cache.move_to_end(text)
+            vectors.append(list(self._query_cache[text]))
+        while len(self._query_cache) > QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+        return vectors
+
+
+def load_embedding_model(model_name=EMBEDDING_MODEL_NAME, cache_dir=None, ignore_cache=False):
+    """
+    Loads the embedding model shared by indexing and querying (see `_load_backend`).
+    With a `cache_dir`, document embeddings are cached on disk across runs;
+    `ignore_cache` re-embeds everything and overwrites the cache.
+    """
+    model, backend = _load_backend(model_name)
+    if cache_dir is None:
+        return model
+    return CachedEmbeddings(model, f"{backend}/{model_name}", cache_dir, ignore_cache=ignore_cache)
+
+
+def _load_backend(model_name):
+    """
+    Loads the sentence-transformer and returns it with a short backend tag.
+    If INFINITY_URL is set, embeddings are served by that Infinity server instead
+    of a local PyTorch model (e.g. `infinity_emb v2 --model-id
+    sentence-transformers/all-MiniLM-L6-v2 --batch-size 64 --dtype float16`).
+    If ONNX_MODEL_DIR is set, an INT8-quantized ONNX export in that directory is
+    used, and is created there on first use.
+    Locally, the model runs in fp16 on CUDA when a GPU is available (override with
+    EMBEDDING_DEVICE); on CPU it uses all cores with batches of 64, the size
+    MiniLM encodes fastest at. `embed_documents` pushes every text through a
+    single `encode` call, and the encoder returns already-normalized vectors.
+    """
+    infinity_url = os.environ.get("INFINITY_URL")
+    if infinity_url:
+        logging.info(f"Using Infinity embedding server at {infinity_url}")
+        return InfinityEmbeddings(infinity_url, model_name=f"sentence-transformers/{model_name}"), "infinity"
+
+    onnx_model_dir = os.environ.get("ONNX_MODEL_DIR")
+    if onnx_model_dir:
+        if not os.path.exists(os.path.join(onnx_model_dir, ONNX_QUANTIZED_FILE)):
+            export_quantized_onnx_model(f"sentence-transformers/{model_name}", onnx_model_dir)
+        logging.info(f"Using INT8 ONNX embedding model from {onnx_model_dir}")
+        return OnnxEmbeddings(onnx_model_dir), "onnx-int8"
+
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    device = os.environ.get("EMBEDDING_DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
+    model_kwargs = {"device": device}
+    if device.startswith("cuda"):
+        model_kwargs["model_kwargs"] = {"torch_dtype": torch.float16}
+        batch_size = GPU_EMBEDDING_BATCH_SIZE
+    else:
+        # Use every core for the encoder's matrix multiplies
+        torch.set_num_threads(os.cpu_count())
+        batch_size = CPU_EMBEDDING_BATCH_SIZE
+    logging.info(f"Loading embedding model {model_name} on {device}")
+
+    model = HuggingFaceEmbeddings(
+        model_name=model_name,
+        show_progress=True,
+        model_kwargs=model_kwargs,
+        encode_kwargs={
+            "batch_size": batch_size,
+            "normalize_embeddings": True,
+            "convert_to_numpy": True,
+        },
+    )
+    return model, "hf"
@@ -3,12 +3,54 @@
 import os
 import re
 import fitz  # PyMuPDF
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 import logging
+from itertools import groupby
+from concurrent.futures import ProcessPoolExecutor
 
 # Set up basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Compiled once at import; \s also matches newlines, so one pass collapses both
+_WS_RE = re.compile(r'\s+')
+
+def clean_text(text):
+    """
+    Collapses every run of whitespace (spaces, tabs, newlines) into a single space
+    and strips the ends.
+    """
+    return _WS_RE.sub(' ', text).strip()
+
+def fast_split(text, size=1000, overlap=200, seps=("\n\n", "\n", ". ", " ")):
+    """
+    Splits text into chunks of at most `size` characters, each overlapping the
+    previous one by up to `overlap` characters. A chunk ends just after the last
+    separator (tried in `seps` order) in the second half of its window, or is
+    hard-split if there is none. Boundaries are computed as offsets, so every
+    chunk is one slice of the original string.
+    """
+    chunks = []
+    start, length = 0, len(text)
+    while start < length:
+        end = min(start + size, length)
+        if end < length:
+            for sep in seps:
+                cut = text.rfind(sep, start + size // 2, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= length:
+            break
+
+        # Step back by the overlap, then forward to the next word boundary
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return chunks
+
 class DocumentChunk:
     """A custom class to hold chunk data and its source metadata."""
     def __init__(self, page_content, document_name, page_number):
@@ -21,48 +63,108 @@ class DocumentChunk:
     def __repr__(self):
         return f"DocumentChunk(source='{self.metadata['source']}', page={self.metadata['page']})"
 
-def process_documents(document_directory="documents"):
+# Plain text in reading order; image blocks are never needed for chunking
+_TEXT_FLAGS = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# Large PDFs are split into page ranges of this size so their pages spread across workers
+PAGES_PER_TASK = 16
+
+def _page_range_tasks(file_path):
+    """
+    Splits one PDF into (path, first_page, end_page) tasks.
+    """
+    try:
+        with fitz.open(file_path) as doc:
+            page_count = len(doc)
+    except Exception as e:
+        logging.error(f"Failed to process {file_path}: {e}")
+        return []
+    return [(file_path, start, min(start + PAGES_PER_TASK, page_count))
+            for start in range(0, page_count, PAGES_PER_TASK)]
+
+def _process_page_range(task):
     """
-    Finds all PDFs in a directory, extracts text, and returns a list of DocumentChunk objects.
+    Extracts, cleans and chunks the text of a range of pages of one PDF.
+    Runs in a worker process, so it opens its own document.
     """
-    if not os.path.exists(document_directory):
+    file_path, first_page, end_page = task
+    filename = os.path.basename(file_path)
+    logging.info(f"Processing {file_path} (pages {first_page + 1}-{end_page})...")
+
+    chunks = []
+    try:
+        # The context manager releases the document's native memory even on errors
+        with fitz.open(file_path) as doc:
+            for page_num in range(first_page, end_page):
+                text = doc[page_num].get_text("text", sort=True, flags=_TEXT_FLAGS)
+                if not text:
+                    continue
+                
+                # Clean the text before chunking
+                cleaned_text = clean_text(text)
+                
+                for chunk_text in fast_split(cleaned_text, size=1000, overlap=200):
+                    # For each chunk, create our custom object with metadata
+                    chunks.append(DocumentChunk(
+                        page_content=chunk_text,
+                        document_name=filename,
+                        page_number=page_num + 1 # Page numbers are 1-based
+                    ))
+    except Exception as e:
+        logging.error(f"Failed to process {file_path}: {e}")
+    finally:
+        # Empty MuPDF's glyph/resource store so long-lived workers don't accumulate it
+        fitz.TOOLS.store_shrink(100)
+    return chunks
+
+def chunk_document(document):
+    """
+    Chunks an already-parsed `models.document.Document` (from the Round 1A parser)
+    page by page, so the PDF does not have to be opened and parsed a second time.
+    Each page's text is rebuilt from its blocks with the whitespace that separated
+    them, so a word split across two spans stays one word.
+    """
+    chunks = []
+    for page_number, blocks in groupby(document.text_blocks, key=lambda block: block.page):
+        cleaned_text = clean_text("".join(block.separator + block.text for block in blocks))
+        for chunk_text in fast_split(cleaned_text, size=1000, overlap=200):
+            chunks.append(DocumentChunk(
+                page_content=chunk_text,
+                document_name=document.filename,
+                page_number=page_number
+            ))
+    return chunks
+
+def extract_chunks(file_path):
+    """
+    Extracts and chunks all pages of one PDF in the current process.
+    """
+    return [chunk for task in _page_range_tasks(file_path) for chunk in _process_page_range(task)]
+
+def list_pdfs(document_directory):
+    """
+    Returns the paths of all PDF files in a directory, in a single scandir pass.
+    """
+    if not os.path.isdir(document_directory):
         logging.error(f"Directory not found: {document_directory}")
         return []
+    with os.scandir(document_directory) as entries:
+        return [entry.path for entry in entries
+                if entry.is_file() and entry.name.lower().endswith(".pdf")]
+
+def process_documents(pdf_paths):
+    """
+    Extracts text from the given PDFs and returns a list of DocumentChunk objects.
+    Page ranges of all PDFs are parsed in parallel, one worker process per CPU core,
+    and chunks are returned in document and page order.
+    """
+    pdf_paths = list(pdf_paths)
+    tasks = [task for path in pdf_paths for task in _page_range_tasks(path)]
 
     all_chunks = []
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len
-    )
-
-    for filename in os.listdir(document_directory):
-        if filename.lower().endswith(".pdf"):
-            file_path = os.path.join(document_directory, filename)
-            logging.info(f"Processing {file_path}...")
-            
-            try:
-                doc = fitz.open(file_path)
-                for page_num, page in enumerate(doc):
-                    text = page.get_text()
-                    if not text:
-                        continue
-                    
-                    # Clean the text before chunking
-                    cleaned_text = re.sub(r'\s+', ' ', text).strip()
-                    
-                    chunks = text_splitter.split_text(cleaned_text)
-                    for chunk_text in chunks:
-                        # For each chunk, create our custom object with metadata
-                        chunk_obj = DocumentChunk(
-                            page_content=chunk_text,
-                            document_name=filename,
-                            page_number=page_num + 1 # Page numbers are 1-based
-                        )
-                        all_chunks.append(chunk_obj)
-                doc.close()
-                logging.info(f"Created chunks for {filename}.")
-            except Exception as e:
-                logging.error(f"Failed to process {file_path}: {e}")
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for chunks in executor.map(_process_page_range, tasks, chunksize=1):
+            all_chunks.extend(chunks)
+    logging.info(f"Created {len(all_chunks)} chunks from {len(pdf_paths)} PDFs.")
             
-    return all_chunks
\ No newline at end of file
+    return all_chunks
@@ -4,15 +4,14 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
 
-import json
+import orjson
 import logging
 import datetime
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
 # --- Round 1B Imports ---
-from ingestion import process_documents 
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+from ingestion import list_pdfs, chunk_document, extract_chunks
 
 # --- Round 1A Imports ---
 from src.config.settings import Settings
@@ -22,39 +21,70 @@ from src.extractor import PDFParser, HeadingDetector, OutlineBuilder
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logging.getLogger("pdfminer").setLevel(logging.WARNING)
 
-def run_round_1a_extraction(input_dir: str) -> dict:
+# Round 1A components, created once in each worker process by `_init_1a_worker`
+_1a_components = None
+
+def _init_1a_worker(app_settings):
+    global _1a_components
+    _1a_components = (PDFParser(app_settings), HeadingDetector(app_settings), OutlineBuilder(app_settings))
+
+def _extract_one(pdf_path):
+    """
+    Parses one PDF in a worker process and derives both its outline and its text
+    chunks from that single parse.
+    Returns (filename, outline dict, chunks); if outline extraction fails, the
+    outline is None and the chunks come from the plain-text ingestion path.
     """
-    Runs the header extraction logic from Round 1A on all PDFs in a directory.
-    Returns a dictionary mapping filenames to their JSON outlines.
+    pdf_parser, heading_detector, outline_builder = _1a_components
+    try:
+        logging.info(f"Extracting outline for: {pdf_path.name}")
+        document = pdf_parser.parse(pdf_path)
+        headings = heading_detector.detect_headings(document)
+        outline = outline_builder.build_outline(headings)
+        
+        # Store the structured outline
+        return pdf_path.name, {
+            "title": document.filename,
+            "outline": outline.to_output_entries()
+        }, chunk_document(document)
+    except Exception as e:
+        logging.error(f"Failed to extract outline for {pdf_path.name}: {e}")
+        return pdf_path.name, None, extract_chunks(str(pdf_path))
+
+def run_round_1a_extraction(pdf_paths):
+    """
+    Runs the header extraction logic from Round 1A on the given PDFs,
+    one worker process per CPU core. Each PDF is parsed once, and the parsed
+    text is also chunked for the fine-grained search.
+    Returns a dictionary mapping filenames to their JSON outlines, and the list
+    of DocumentChunk objects of all PDFs in input order.
     """
     logging.info("--- Running Round 1A: Header Extraction ---")
     outlines = {}
+    all_chunks = []
     
-    # Initialize 1A components
     app_settings = Settings.load()
-    pdf_parser = PDFParser(app_settings)
-    heading_detector = HeadingDetector(app_settings)
-    outline_builder = OutlineBuilder(app_settings)
-    
-    pdf_files = [p for p in Path(input_dir).glob("*.pdf")]
+    pdf_files = [Path(p) for p in pdf_paths]
+    if len(pdf_files) == 1:
+        # A single PDF is parsed in this process, with its pages spread over the cores
+        app_settings.PAGE_WORKERS = os.cpu_count() or 1
+        _init_1a_worker(app_settings)
+        results = [_extract_one(pdf_files[0])]
+    else:
+        # PDFs are spread across processes, so each one parses its pages sequentially
+        app_settings.PAGE_WORKERS = 1
+        with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_init_1a_worker,
+                                 initargs=(app_settings,)) as executor:
+            results = list(executor.map(_extract_one, pdf_files))
     
-    for pdf_path in pdf_files:
-        try:
-            logging.info(f"Extracting outline for: {pdf_path.name}")
-            document = pdf_parser.parse(pdf_path)
-            headings = heading_detector.detect_headings(document)
-            outline = outline_builder.build_outline(headings)
-            
-            # Store the structured outline
-            outlines[pdf_path.name] = {
-                "title": document.filename,
-                "outline": [{"level": f"H{h.level}", "text": h.text, "page": h.page} for h in outline.headings]
-            }
-        except Exception as e:
-            logging.error(f"Failed to extract outline for {pdf_path.name}: {e}")
+    for name, outline, chunks in results:
+        if outline is not None:
+            outlines[name] = outline
+        all_chunks.extend(chunks)
             
     logging.info(f"Successfully extracted outlines for {len(outlines)} documents.")
-    return outlines
+    logging.info(f"Created {len(all_chunks)} chunks from {len(pdf_files)} PDFs.")
+    return outlines, all_chunks
 
 def main():
     """
@@ -63,6 +93,9 @@ def main():
     # --- Define Folder Paths for Docker / Local ---
     INPUT_DIR = os.environ.get("INPUT_DIR", "input")
     OUTPUT_DIR = os.environ.get("OUTPUT_DIR", "output")
+    # Embeddings and built indexes are cached here across runs; IGNORE_CACHE=1 rebuilds them
+    CACHE_DIR = os.environ.get("CACHE_DIR", ".cache")
+    IGNORE_CACHE = os.environ.get("IGNORE_CACHE") == "1"
 
 
     # --- User Input & Query Processing ---
@@ -70,50 +103,58 @@ def main():
     user_goal = "Analyze revenue trends, R&D investments, and market positioning strategies"
     search_query = f"As a {user_role}, I need to {user_goal}."
     
-    # --- Step 1: Run Round 1A to get document outlines ---
-    document_outlines = run_round_1a_extraction(INPUT_DIR)
+    # List the input PDFs once; every later stage reuses this list
+    pdf_paths = list_pdfs(INPUT_DIR)
+    if not pdf_paths:
+        logging.warning(f"No PDF files found in {INPUT_DIR}. Exiting.")
+        return
+
+    # --- Step 1: Run Round 1A to get document outlines and text chunks ---
+    document_outlines, all_chunks = run_round_1a_extraction(pdf_paths)
 
-    # --- Step 2: Coarse-Grained Search on Headings ---
-    logging.info("--- Running Step 2: Coarse-Grained Search on Headings ---")
+    # --- Step 2: Build One Index over Headings and Chunks ---
+    logging.info("--- Running Step 2: Indexing Headings and Document Chunks ---")
+
+    # Imported here so torch/transformers only load once there is something to embed
+    from embeddings import load_embedding_model
+    from retrieval import VectorIndex
     
     all_headings = []
     for filename, data in document_outlines.items():
         for heading in data.get("outline", []):
             heading['source_doc'] = filename
             all_headings.append(heading)
-    
-    heading_texts = [h['text'] for h in all_headings]
-    embedding_model = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    
-    vector_store_headings = Chroma.from_texts(
-        texts=heading_texts,
-        embedding=embedding_model,
-        metadatas=all_headings
-    )
-    
-    relevant_headings = vector_store_headings.similarity_search(search_query, k=5)
-    logging.info(f"Found {len(relevant_headings)} potentially relevant major sections.")
 
-    # --- Step 3: Fine-Grained Search within Relevant Sections ---
-    all_chunks = process_documents(document_directory=INPUT_DIR)
     if not all_chunks:
         logging.warning("No document chunks processed. Exiting.")
         return
 
-    chunk_texts = [chunk.page_content for chunk in all_chunks]
-    vector_store_chunks = Chroma.from_texts(
-        texts=chunk_texts,
+    # Headings and chunks share one index; the "kind" field keeps the two searches apart
+    texts = [h['text'] for h in all_headings] + [chunk.page_content for chunk in all_chunks]
+    metadatas = ([{**h, "kind": "heading"} for h in all_headings] +
+                 [{**chunk.metadata, "kind": "chunk"} for chunk in all_chunks])
+    embedding_model = load_embedding_model(cache_dir=CACHE_DIR, ignore_cache=IGNORE_CACHE)
+
+    vector_store = VectorIndex.from_texts(
+        texts=texts,
         embedding=embedding_model,
-        metadatas=[chunk.metadata for chunk in all_chunks]
+        metadatas=metadatas,
+        cache_dir=CACHE_DIR,
+        ignore_cache=IGNORE_CACHE
     )
 
-    relevant_docs = vector_store_chunks.similarity_search(search_query, k=10)
+    # --- Step 3: Coarse-Grained Search on Headings ---
+    relevant_headings = vector_store.similarity_search(search_query, k=5, filter={"kind": "heading"})
+    logging.info(f"Found {len(relevant_headings)} potentially relevant major sections.")
+
+    # --- Step 4: Fine-Grained Search over Document Chunks ---
+    relevant_docs = vector_store.similarity_search(search_query, k=10, filter={"kind": "chunk"})
     
     # --- Final JSON Output Generation ---
     logging.info("Formatting final output...")
     output_data = {
         "metadata": {
-            "input_documents": list(document_outlines.keys()),
+            "input_documents": [os.path.basename(p) for p in pdf_paths],
             "persona": user_role,
             "job_to_be_done": user_goal,
             "processing_timestamp": datetime.datetime.now().isoformat(),
@@ -122,23 +163,23 @@ def main():
                 "top_sections_found": [doc.metadata for doc in relevant_headings]
             }
         },
-        "extracted_sections": []
+        # Sections are built straight into the output; orjson serializes it in one pass
+        "extracted_sections": [
+            {
+                "document": doc.metadata.get("source", "Unknown"),
+                "page_number": doc.metadata.get("page", -1),
+                "importance_rank": i + 1,
+                "refined_text": doc.page_content,
+                "section_title": doc.page_content[:100] + "..."
+            }
+            for i, doc in enumerate(relevant_docs)
+        ]
     }
 
-    for i, doc in enumerate(relevant_docs):
-        section = {
-            "document": doc.metadata.get("source", "Unknown"),
-            "page_number": doc.metadata.get("page", -1),
-            "importance_rank": i + 1,
-            "refined_text": doc.page_content,
-            "section_title": doc.page_content[:100] + "..."
-        }
-        output_data["extracted_sections"].append(section)
-
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     output_filename = os.path.join(OUTPUT_DIR, "output.json")
-    with open(output_filename, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=4)
+    with open(output_filename, 'wb') as f:
+        f.write(orjson.dumps(output_data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
 
     logging.info(f"✅✅✅ Success! Integrated analysis complete. Output written to {output_filename} ✅✅✅")
 
@@ -0,0 +1,278 @@
+# retrieval.py (v1 - FAISS HNSW Vector Index)
+
+import os
+import json
+import shutil
+import tempfile
+import hashlib
+import logging
+from typing import List
+
+import faiss
+import numpy as np
+from numba import njit, prange
+from langchain_core.documents import Document
+
+# HNSW graph parameters: M links per node, build-time and query-time beam widths
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Index type by corpus size: exact flat search below FLAT_INDEX_MAX_SIZE vectors,
+# HNSW over int8 scalar-quantized vectors up to PQ_INDEX_MIN_SIZE, HNSW over PQ codes beyond that
+FLAT_INDEX_MAX_SIZE = 4096
+PQ_INDEX_MIN_SIZE = 100_000
+PQ_SUBQUANTIZERS = 48  # 384-d FP32 (1536 bytes) -> 48 one-byte codes
+
+# Approximate indexes over-fetch this many candidates, which are then re-scored exactly
+RERANK_CANDIDATES = 100
+CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Bumped whenever the index layout or parameters change, so stale cached indexes are rebuilt
+INDEX_FORMAT_VERSION = 5
+INDEX_FILE = "index.faiss"
+VECTORS_FILE = "vectors.npy"
+CHUNKS_FILE = "chunks.json"
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _cosine_scores(vectors, queries):
+    """Inner products of every (unit-length) query against every row, in parallel over rows."""
+    n, dim = vectors.shape
+    scores = np.empty((queries.shape[0], n), dtype=np.float32)
+    for i in prange(n):
+        for q in range(queries.shape[0]):
+            total = np.float32(0.0)
+            for d in range(dim):
+                total += vectors[i, d] * queries[q, d]
+            scores[q, i] = total
+    return scores
+
+
+def topk_cosine(vectors, queries, k):
+    """
+    Exact top-k by cosine similarity over L2-normalized rows.
+    Returns a (len(queries), k) array of row ids, best match first.
+    """
+    scores = _cosine_scores(vectors, queries)
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1)
+
+
+def _build_faiss_index(vectors):
+    """
+    Picks the FAISS index for a set of L2-normalized vectors by corpus size.
+    The quantized indexes are trained on the corpus itself; the PQ index ranks by L2 distance,
+    which orders unit vectors the same way as inner product (HNSW over PQ codes
+    recalls noticeably less with the inner-product metric).
+    """
+    count, dim = vectors.shape
+    if count < FLAT_INDEX_MAX_SIZE:
+        index = faiss.IndexFlatIP(dim)
+    elif count < PQ_INDEX_MIN_SIZE or dim % PQ_SUBQUANTIZERS != 0:
+        # One byte per dimension: a quarter of the memory traffic of FP32 per comparison
+        index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+    else:
+        index = faiss.IndexHNSWPQ(dim, PQ_SUBQUANTIZERS, HNSW_M)
+        index.train(vectors)
+
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    index.add(vectors)
+    return index
+
+
+def load_cross_encoder(model_name=CROSS_ENCODER_MODEL):
+    """Loads a cross-encoder for optional final reranking in `similarity_search`."""
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name)
+
+
+def _corpus_key(texts, metadatas, embedding) -> str:
+    """A stable hash of the index format, model, texts and metadata an index is built from."""
+    digest = hashlib.sha256(f"v{INDEX_FORMAT_VERSION}".encode("utf-8"))
+    digest.update(getattr(embedding, "model_name", type(embedding).__name__).encode("utf-8"))
+    for text, metadata in zip(texts, metadatas):
+        digest.update(b"\x00" + text.encode("utf-8"))
+        digest.update(b"\x01" + json.dumps(metadata, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+class VectorIndex:
+    """
+    An in-memory nearest-neighbour index over text chunks.
+    Exposes the same `similarity_search` interface the pipeline used with Chroma.
+    """
+    def __init__(self, index, vectors, texts, metadatas, embedding):
+        self.index = index
+        self.vectors = vectors
+        self.texts = texts
+        self.metadatas = metadatas
+        self.embedding = embedding
+        self._filtered_indexes = {}
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, cache_dir=None, ignore_cache=False):
+        """
+        Embeds all distinct texts in a single call and indexes the L2-normalized vectors
+        (see `_build_faiss_index`), so similarity is cosine similarity.
+        With a `cache_dir`, the built index is saved there and reused by later runs
+        over the same texts, metadata and model; `ignore_cache` forces a rebuild.
+        """
+        texts = list(texts)
+        if not texts:
+            raise ValueError("Cannot build a vector index from an empty list of texts.")
+        metadatas = [dict(m) for m in metadatas] if metadatas is not None else [{} for _ in texts]
+
+        index_dir = None
+        if cache_dir:
+            index_dir = os.path.join(cache_dir, "index", _corpus_key(texts, metadatas, embedding))
+            cached = all(os.path.exists(os.path.join(index_dir, name)) for name in (INDEX_FILE, VECTORS_FILE, CHUNKS_FILE))
+            if not ignore_cache and cached:
+                logging.info(f"Loading cached vector index from {index_dir}")
+                return cls.load(index_dir, embedding)
+
+        # Boilerplate (headers, footers, TOC lines) repeats verbatim across pages;
+        # embed each distinct text once and expand back to one vector per chunk
+        unique_ids = {}
+        back = [unique_ids.setdefault(text, len(unique_ids)) for text in texts]
+        unique_vectors = np.asarray(embedding.embed_documents(list(unique_ids)), dtype=np.float32)
+        faiss.normalize_L2(unique_vectors)
+        vectors = unique_vectors[back]
+        if len(unique_ids) < len(texts):
+            logging.info(f"Embedded {len(unique_ids)} unique texts for {len(texts)} chunks.")
+
+        index = _build_faiss_index(vectors)
+
+        logging.info(f"Built {type(index).__name__} over {index.ntotal} vectors (dim={vectors.shape[1]}).")
+        vector_index = cls(index, vectors, texts, metadatas, embedding)
+        if index_dir:
+            vector_index.save(index_dir)
+        return vector_index
+
+    def save(self, directory):
+        """
+        Writes the index, its vectors and the chunk texts/metadata to a directory.
+        The files are written to a temporary sibling directory that is then renamed
+        into place, so an interrupted save never leaves a partial index behind.
+        """
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+        try:
+            faiss.write_index(self.index, os.path.join(staging, INDEX_FILE))
+            np.save(os.path.join(staging, VECTORS_FILE), self.vectors)
+            with open(os.path.join(staging, CHUNKS_FILE), 'w', encoding='utf-8') as f:
+                json.dump({"texts": self.texts, "metadatas": self.metadatas}, f)
+            if os.path.isdir(directory):
+                # Replacing a previous save (e.g. with ignore_cache); os.replace needs the target gone
+                shutil.rmtree(directory)
+            os.replace(staging, directory)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(cls, directory, embedding):
+        """Restores an index written by `save`; `embedding` is used for queries."""
+        index = faiss.read_index(os.path.join(directory, INDEX_FILE))
+        vectors = np.load(os.path.join(directory, VECTORS_FILE))
+        with open(os.path.join(directory, CHUNKS_FILE), 'r', encoding='utf-8') as f:
+            chunks = json.load(f)
+        return cls(index, vectors, chunks["texts"], chunks["metadatas"], embedding)
+
+    def similarity_search(self, query: str, k: int = 4, exact: bool = False, cross_encoder=None,
+                          filter: dict = None) -> List[Document]:
+        """
+        Returns the k chunks closest to the query, best match first.
+        With `exact=True`, every chunk's full vector is scored instead of querying the FAISS index.
+        A `filter` such as {"kind": "heading"} restricts results to chunks whose metadata matches it.
+        If a `cross_encoder` is given, the k results are reordered by its (query, chunk) scores.
+        """
+        documents = self.similarity_search_by_vector(
+            self.embedding.embed_query(query), k=k, exact=exact, filter=filter
+        )
+        if cross_encoder is not None and len(documents) > 1:
+            scores = cross_encoder.predict([(query, doc.page_content) for doc in documents])
+            documents = [documents[i] for i in np.argsort(-np.asarray(scores), kind="stable")]
+        return documents
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, exact: bool = False,
+                                    filter: dict = None) -> List[Document]:
+        """
+        Same as `similarity_search`, for a query that has already been embedded.
+        """
+        return self.similarity_search_batch([embedding], k=k, exact=exact, filter=filter)[0]
+
+    def similarity_search_batch(self, embeddings, k: int = 4, exact: bool = False,
+                                filter: dict = None) -> List[List[Document]]:
+        """
+        Searches for many already-embedded queries with one index call.
+        Returns one best-first list of documents per query.
+        """
+        # Queries are normalized like the indexed vectors, so every comparison is a plain dot product
+        query_vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.vectors.shape[1])
+        faiss.normalize_L2(query_vectors)
+
+        params = None
+        if filter:
+            ids = self._filter_ids(filter)
+            if not len(ids):
+                return [[] for _ in query_vectors]
+            if exact:
+                rows = ids[topk_cosine(self.vectors[ids], query_vectors, k)]
+                return [[self._to_document(i) for i in row] for row in rows]
+            if len(ids) < FLAT_INDEX_MAX_SIZE:
+                # Small subsets (e.g. headings) are searched exactly with their own flat index
+                _, rows = self._filtered_index(filter, ids).search(query_vectors, min(k, len(ids)))
+                return [[self._to_document(ids[i]) for i in row if i != -1] for row in rows]
+            selector = faiss.IDSelectorBatch(ids)
+            if isinstance(self.index, faiss.IndexHNSW):
+                params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.index.hnsw.efSearch)
+            else:
+                params = faiss.SearchParameters(sel=selector)
+
+        if exact:
+            rows = topk_cosine(self.vectors, query_vectors, k)
+        elif isinstance(self.index, faiss.IndexFlat):
+            _, rows = self.index.search(query_vectors, k, params=params)
+        else:
+            rows = self._search_and_rerank(query_vectors, k, params)
+        return [[self._to_document(i) for i in ids if i != -1] for ids in rows]
+
+    def _filtered_index(self, filter: dict, ids: np.ndarray):
+        """An IndexFlatIP over the vectors of `ids`, built once per filter."""
+        key = json.dumps(filter, sort_keys=True, default=str)
+        if key not in self._filtered_indexes:
+            index = faiss.IndexFlatIP(self.vectors.shape[1])
+            index.add(self.vectors[ids])
+            self._filtered_indexes[key] = index
+        return self._filtered_indexes[key]
+
+    def _filter_ids(self, filter: dict) -> np.ndarray:
+        """Ids of the chunks whose metadata has every key/value pair in `filter`."""
+        return np.array([i for i, metadata in enumerate(self.metadatas)
+                         if all(metadata.get(key) == value for key, value in filter.items())],
+                        dtype=np.int64)
+
+    def _search_and_rerank(self, query_vectors, k, params=None):
+        """
+        Over-fetches candidates from the approximate index, then re-scores them
+        with their full-precision vectors and keeps the best k per query.
+        """
+        _, candidates = self.index.search(
+            query_vectors, min(max(k, RERANK_CANDIDATES), self.index.ntotal), params=params
+        )
+        rows = []
+        for query_vector, ids in zip(query_vectors, candidates):
+            ids = ids[ids != -1]
+            scores = self.vectors[ids] @ query_vector
+            rows.append(ids[np.argsort(-scores, kind="stable")[:k]])
+        return rows
+
+    def _to_document(self, i: int) -> Document:
+        return Document(page_content=self.texts[i], metadata=self.metadatas[i])
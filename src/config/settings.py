@@ -13,6 +13,15 @@ class Settings:
     """
     MAX_HEADING_LENGTH: int = 150
     MIN_HEADING_CONFIDENCE: float = 0.4
+    # Worker processes PDFParser may use to parse the pages of one PDF (1 = sequential).
+    # The entry points raise it to the core count only when they process a single PDF
+    PAGE_WORKERS: int = 1
+    # Scanned pages are rendered in grayscale at this resolution for OCR
+    OCR_DPI: int = 200
+    # Binarize rendered pages with Otsu's threshold before OCR
+    OCR_PREPROCESS: bool = True
+    # Extra Tesseract options (--oem 1 = LSTM engine only; add e.g. "--psm 6" for single-column scans)
+    OCR_TESSERACT_CONFIG: str = "--oem 1"
 
     @classmethod
     def load(cls):
@@ -7,6 +7,7 @@ import logging
 from typing import List, Dict, Tuple
 from collections import defaultdict
 import numpy as np
+import ahocorasick
 
 from models.document import Document, TextBlock
 from config.settings import Settings
@@ -14,15 +15,57 @@ from models.outline import Heading
 
 logger = logging.getLogger(__name__)
 
+# Font-name fragments that mark a bold face
+_BOLD_WORDS = ('bold', 'black', 'heavy', 'gothicb')
+
+# --- Language-Specific Dictionaries (built once at import, shared by all detectors) ---
+
+def _compile_numbering(rules):
+    """
+    Compile (pattern, score) rules into one alternation with a named group per
+    rule, so a single match finds the first rule that applies.
+    Returns the compiled pattern and a map from group name to score.
+    """
+    pattern = '|'.join(f'(?P<r{i}>{rule})' for i, (rule, _) in enumerate(rules))
+    return re.compile(pattern), {f'r{i}': score for i, (_, score) in enumerate(rules)}
+
+_ENG_KEYWORDS = frozenset({'introduction', 'conclusion', 'abstract', 'summary', 'background', 
+                           'methodology', 'results', 'discussion', 'references', 'appendix', 
+                           'chapter', 'section'})
+
+def _build_keyword_automaton(keywords):
+    """
+    Build an Aho-Corasick automaton over a keyword set, so one scan of a text
+    finds whether any keyword occurs in it.
+    """
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+_ENG_KEYWORD_AUTOMATON = _build_keyword_automaton(_ENG_KEYWORDS)
+
+_ENG_NUMBERING = _compile_numbering([
+    (r'^\d+\.\d*', 0.8),
+    (r'^[A-Z]\.', 0.7),
+    (r'(?i:^[IVXLC]+\.\s+)', 0.7),
+    (r'(?i:^(?:Chapter|Section)\s+\d+)', 0.9),
+])
+
+_JPN_KEYWORDS = frozenset({'概要', 'はじめに', '要旨', '背景', '目的', '方法', '結果', '考察', '結論', '参考文献', '付録'})
+
+_JPN_KEYWORD_AUTOMATON = _build_keyword_automaton(_JPN_KEYWORDS)
+
+_JPN_NUMBERING = _compile_numbering([
+    (r'^第[一二三四五六七八九十百]+(?:章|節)', 1.0), # "Chapter 1", etc.
+    (r'^\d+．', 0.8), # Full-width dot
+    (r'^\d+\.\d*', 0.7),
+])
+
 class HeadingDetector:
     def __init__(self, settings: Settings):
         self.settings = settings
-        # English Heuristics
-        self._eng_keywords = self._load_english_keywords()
-        self._eng_numbering = self._compile_english_numbering()
-        # Japanese Heuristics
-        self._jpn_keywords = self._load_japanese_keywords()
-        self._jpn_numbering = self._compile_japanese_numbering()
 
     def detect_headings(self, document: Document) -> List[Heading]:
         """
@@ -38,41 +81,67 @@ class HeadingDetector:
     # --- English Heading Detection Logic (Your existing logic) ---
 
     def _detect_headings_english(self, document: Document) -> List[Heading]:
-        candidates = self._identify_candidates_english(document)
-        scored_candidates = self._score_candidates_english(candidates, document)
+        scored_candidates = self._score_candidates_english(document)
         headings = self._classify_heading_levels(scored_candidates)
         final_headings = self._post_process_headings(headings)
         
         logger.info(f"Detected {len(final_headings)} English headings.")
         return final_headings
 
-    def _identify_candidates_english(self, document: Document) -> List[TextBlock]:
-        candidates = []
-        for block in document.text_blocks:
-            text = block.text.strip()
-            if not text or len(text) > self.settings.MAX_HEADING_LENGTH: continue
-            if block.font_info.size < (document.avg_font_size or 12.0): continue
-            if text.endswith(('.', '!', '?', ';', ':')) and len(text) > 20: continue
-            candidates.append(block)
-        return candidates
-    
-    def _score_candidates_english(self, candidates: List[TextBlock], document: Document) -> List[Tuple[TextBlock, float]]:
-        """Score candidates for English documents."""
-        scored = []
-        for block in candidates:
-            weights = {"size": 0.5, "style": 0.3, "position": 0.1, "numbering": 0.1}
-            score = (
-                self._calculate_font_size_score(block, document) * weights["size"] +
-                self._calculate_font_style_score(block, document) * weights["style"] +
-                self._calculate_position_score(block, document) * weights["position"] +
-                self._calculate_numbering_score(block, self._eng_numbering) * weights["numbering"]
-            )
-            if self._calculate_keyword_score(block, self._eng_keywords) > 0:
-                score = min(1.0, score + 0.1)
-
-            if score >= self.settings.MIN_HEADING_CONFIDENCE:
-                scored.append((block, score))
-        return sorted(scored, key=lambda x: x[1], reverse=True)
+    def _score_candidates_english(self, document: Document) -> List[Tuple[TextBlock, float]]:
+        """
+        Filter and score candidate blocks for English documents in one pass.
+        Block fields are gathered into NumPy columns once; the candidate filter and
+        the size/style/position scores are computed over whole columns, and only the
+        numbering/keyword checks run per candidate.
+        """
+        blocks = document.text_blocks
+        if not blocks:
+            return []
+
+        avg_size = document.avg_font_size or 12.0
+        texts = [block.text.strip() for block in blocks]
+        lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(blocks))
+        sizes = np.fromiter((b.font_info.size for b in blocks), dtype=np.float64, count=len(blocks))
+        sentence_like = np.fromiter((text.endswith(('.', '!', '?', ';', ':')) for text in texts),
+                                    dtype=bool, count=len(blocks))
+
+        # Candidate filter: non-empty, short enough, not smaller than body text, not a sentence
+        mask = ((lengths > 0) & (lengths <= self.settings.MAX_HEADING_LENGTH) &
+                (sizes >= avg_size) & ~(sentence_like & (lengths > 20)))
+        idx = np.flatnonzero(mask)
+        if not idx.size:
+            return []
+        candidates = [blocks[i] for i in idx]
+        candidate_texts = [texts[i] for i in idx]
+
+        ratio = sizes[idx] / avg_size
+        size_score = np.select([ratio > 1.5, ratio > 1.3, ratio > 1.1], [1.0, 0.8, 0.6], default=0.2)
+
+        bold = np.fromiter((any(w in b.font_info.family.lower() for w in _BOLD_WORDS) for b in candidates),
+                           dtype=bool, count=idx.size)
+        style_score = np.where(bold, 0.8, 0.0)
+
+        page_widths = np.array([dims[0] for dims in document.page_dimensions], dtype=np.float64)
+        widths = page_widths[np.fromiter((b.page for b in candidates), dtype=np.int64, count=idx.size) - 1]
+        x = np.fromiter((b.x for b in candidates), dtype=np.float64, count=idx.size)
+        block_widths = np.fromiter((b.width for b in candidates), dtype=np.float64, count=idx.size)
+        center_diff = np.abs((x + block_widths / 2) - (widths / 2))
+        position_score = np.select([center_diff < widths * 0.15, x < widths * 0.1], [0.8, 0.5], default=0.0)
+
+        numbering_score = np.fromiter((self._calculate_numbering_score(t, _ENG_NUMBERING) for t in candidate_texts),
+                                      dtype=np.float64, count=idx.size)
+        has_keyword = np.fromiter((self._calculate_keyword_score(t, _ENG_KEYWORD_AUTOMATON) > 0 for t in candidate_texts),
+                                  dtype=bool, count=idx.size)
+
+        weights = {"size": 0.5, "style": 0.3, "position": 0.1, "numbering": 0.1}
+        scores = (size_score * weights["size"] + style_score * weights["style"] +
+                  position_score * weights["position"] + numbering_score * weights["numbering"])
+        scores = np.where(has_keyword, np.minimum(1.0, scores + 0.1), scores)
+
+        keep = np.flatnonzero(scores >= self.settings.MIN_HEADING_CONFIDENCE)
+        order = keep[np.argsort(-scores[keep], kind="stable")]
+        return [(candidates[i], float(scores[i])) for i in order]
 
     # --- Japanese Heading Detection Logic (NEW) ---
 
@@ -95,13 +164,14 @@ class HeadingDetector:
         """Score candidates for Japanese documents."""
         scored = []
         for block in candidates:
+            text = block.text.strip()
             # For Japanese, numbering and keywords are much stronger signals
             weights = {"size": 0.4, "style": 0.2, "numbering": 0.3, "keyword": 0.1}
             score = (
                 self._calculate_font_size_score(block, document) * weights["size"] +
                 self._calculate_font_style_score(block, document) * weights["style"] +
-                self._calculate_numbering_score(block, self._jpn_numbering) * weights["numbering"] +
-                self._calculate_keyword_score(block, self._jpn_keywords) * weights["keyword"]
+                self._calculate_numbering_score(text, _JPN_NUMBERING) * weights["numbering"] +
+                self._calculate_keyword_score(text, _JPN_KEYWORD_AUTOMATON) * weights["keyword"]
             )
             if score >= self.settings.MIN_HEADING_CONFIDENCE:
                 scored.append((block, score))
@@ -120,7 +190,7 @@ class HeadingDetector:
     def _calculate_font_style_score(self, block, doc):
         score = 0
         font_name = block.font_info.family.lower()
-        if any(w in font_name for w in ['bold', 'black', 'heavy', 'gothicb']): score += 0.8
+        if any(w in font_name for w in _BOLD_WORDS): score += 0.8
         return min(score, 1.0)
         
     def _calculate_position_score(self, block, doc):
@@ -131,11 +201,15 @@ class HeadingDetector:
         if block.x < (page_width * 0.1): return 0.5
         return 0
 
-    def _calculate_numbering_score(self, block, numbering_rules):
-        return next((score for pattern, score in numbering_rules if pattern.match(block.text.strip())), 0)
+    # The text helpers take a block's already-stripped text, so each block is stripped once
+
+    def _calculate_numbering_score(self, text, numbering_rules):
+        pattern, scores = numbering_rules
+        match = pattern.match(text)
+        return scores[match.lastgroup] if match else 0
 
-    def _calculate_keyword_score(self, block, keyword_set):
-        return 1 if any(keyword in block.text for keyword in keyword_set) else 0
+    def _calculate_keyword_score(self, text, keyword_automaton):
+        return 1 if next(keyword_automaton.iter(text), None) is not None else 0
 
     def _classify_heading_levels(self, scored_candidates):
         if not scored_candidates: return []
@@ -156,37 +230,17 @@ class HeadingDetector:
         return headings
 
     def _post_process_headings(self, headings):
+        """
+        Sort headings into reading order (page, then y) and drop repeats of the
+        same text, keeping each text's first occurrence.
+        """
         if not headings: return []
-        headings.sort(key=lambda h: (h.page, h.position[1]))
-        unique_headings, seen_texts = [], set()
-        for h in headings:
-            norm_text = h.text.lower().strip()
-            if norm_text not in seen_texts:
-                unique_headings.append(h)
-                seen_texts.add(norm_text)
-        return unique_headings
-
-    # --- Language-Specific Dictionaries ---
-
-    def _load_english_keywords(self):
-        return {'introduction', 'conclusion', 'abstract', 'summary', 'background', 
-                'methodology', 'results', 'discussion', 'references', 'appendix', 
-                'chapter', 'section'}
-
-    def _compile_english_numbering(self):
-        return [
-            (re.compile(r'^\d+\.\d*'), 0.8),
-            (re.compile(r'^[A-Z]\.'), 0.7),
-            (re.compile(r'^[IVXLC]+\.\s+', re.IGNORECASE), 0.7),
-            (re.compile(r'^(Chapter|Section)\s+\d+', re.IGNORECASE), 0.9),
-        ]
-
-    def _load_japanese_keywords(self):
-        return {'概要', 'はじめに', '要旨', '背景', '目的', '方法', '結果', '考察', '結論', '参考文献', '付録'}
-
-    def _compile_japanese_numbering(self):
-        return [
-            (re.compile(r'^第[一二三四五六七八九十百]+(章|節)'), 1.0), # "Chapter 1", etc.
-            (re.compile(r'^\d+．'), 0.8), # Full-width dot
-            (re.compile(r'^\d+\.\d*'), 0.7),
-        ]
\ No newline at end of file
+        count = len(headings)
+        pages = np.fromiter((h.page for h in headings), dtype=np.int64, count=count)
+        ys = np.fromiter((h.position[1] for h in headings), dtype=np.float64, count=count)
+        order = np.lexsort((ys, pages))
+
+        norm_texts = np.array([headings[i].text.lower().strip() for i in order], dtype=object)
+        _, first_idx = np.unique(norm_texts, return_index=True)
+        first_idx.sort()
+        return [headings[order[i]] for i in first_idx]
@@ -5,17 +5,53 @@ This module takes detected headings and builds a coherent outline structure,
 handling edge cases and ensuring logical hierarchy.
 """
 
+import re
 import logging
 from typing import List, Dict, Optional, Tuple
 from collections import defaultdict
+import numpy as np
+from numba import njit
 
 from models.document import Document
-from models.outline import Outline, Heading
+from models.outline import Outline, Heading, HeadingColumns
 from config.settings import Settings
 
 logger = logging.getLogger(__name__)
 
 
+@njit(cache=True)
+def _validate_levels(levels: np.ndarray) -> np.ndarray:
+    """
+    Hierarchy-validation state machine over an array of heading levels (in
+    reading order), JIT-compiled so the loop runs on unboxed integers. The first heading becomes H1; an H3 stays H3 only while an
+    H2 is open in the current section, otherwise it is demoted to H2.
+    `open_levels` is a bitmask of the levels on the current section stack.
+    """
+    adjusted = np.empty_like(levels)
+    open_levels = 0
+    for i in range(levels.shape[0]):
+        level = levels[i]
+        if i == 0 or level == 1:
+            level = 1
+        elif level == 3 and not open_levels & (1 << 2):
+            level = 2
+        adjusted[i] = level
+        # Close every level at or below the new one, then open it
+        open_levels = (open_levels & ((1 << level) - 1)) | (1 << level)
+    return adjusted
+
+# Heading numbering patterns, compiled once at import
+_NUMBERING_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'^\d+\.',
+    r'^\d+\.\d+',
+    r'^[A-Z]\.',
+    r'^[IVX]+\.',
+    r'^\(\d+\)',
+    r'^Chapter\s+\d+',
+    r'^Section\s+\d+'
+))
+
+
 class OutlineBuilder:
     """
     Builds structured outlines from detected headings with hierarchy validation
@@ -41,28 +77,31 @@ class OutlineBuilder:
             return Outline(headings=[], hierarchy={})
         
         # Step 1: Sort headings by page and position
-        sorted_headings = self._sort_headings(headings)
+        columns = HeadingColumns.from_headings(headings)
+        order = self._sort_order(columns)
+        sorted_headings = [headings[i] for i in order]
+        columns = columns.take(order)
         
-        # Step 2: Validate and fix hierarchy
-        validated_headings = self._validate_hierarchy(sorted_headings)
+        # Step 2: Validate and fix hierarchy (also updates the columns)
+        validated_headings = self._validate_hierarchy(sorted_headings, columns)
         
         # Step 3: Build hierarchical structure
         hierarchy = self._build_hierarchy(validated_headings)
         
         # Step 4: Calculate quality metrics
-        outline = Outline(headings=validated_headings, hierarchy=hierarchy)
-        self._calculate_outline_metrics(outline)
+        outline = Outline(headings=validated_headings, hierarchy=hierarchy, columns=columns)
+        self._calculate_outline_metrics(outline, columns)
         
         logger.info(f"Built outline with {len(validated_headings)} headings, "
                    f"avg confidence: {outline.average_confidence:.2f}")
         
         return outline
     
-    def _sort_headings(self, headings: List[Heading]) -> List[Heading]:
-        """Sort headings by page number and vertical position."""
-        return sorted(headings, key=lambda h: (h.page, h.position[1]))
+    def _sort_order(self, columns: HeadingColumns) -> np.ndarray:
+        """Stable order of headings by page number, then vertical position."""
+        return np.lexsort((columns.ys, columns.pages))
     
-    def _validate_hierarchy(self, headings: List[Heading]) -> List[Heading]:
+    def _validate_hierarchy(self, headings: List[Heading], columns: HeadingColumns) -> List[Heading]:
         """
         Validate and fix heading hierarchy to ensure logical structure.
         
@@ -70,77 +109,25 @@ class OutlineBuilder:
         - No orphaned H3s without H2 parents
         - No orphaned H2s without H1 parents
         - Reasonable level progression
+        
+        Levels are adjusted over the columns; only the headings whose level changed
+        are touched, in place, and `columns` is updated to match.
         """
         if not headings:
             return []
         
-        validated = []
-        level_stack = []  # Track current hierarchy levels
+        adjusted_levels = _validate_levels(columns.levels)
+        changed = np.flatnonzero(adjusted_levels != columns.levels)
         
-        for heading in headings:
-            # Determine appropriate level based on context
-            adjusted_level = self._determine_appropriate_level(
-                heading, level_stack, validated
-            )
-            
-            # Create new heading with adjusted level if necessary
-            if adjusted_level != heading.level:
-                logger.debug(f"Adjusting heading level from {heading.level} to {adjusted_level}: {heading.text[:50]}")
-                heading = Heading(
-                    text=heading.text,
-                    level=adjusted_level,
-                    page=heading.page,
-                    confidence=heading.confidence * 0.9,  # Slight confidence penalty for adjustment
-                    font_info=heading.font_info,
-                    position=heading.position
-                )
-            
-            # Update level stack
-            self._update_level_stack(level_stack, adjusted_level)
-            validated.append(heading)
+        for i in changed:
+            heading = headings[i]
+            logger.debug(f"Adjusting heading level from {heading.level} to {adjusted_levels[i]}: {heading.text[:50]}")
+            heading.level = int(adjusted_levels[i])
+            heading.confidence *= 0.9  # Slight confidence penalty for adjustment
         
-        return validated
-    
-    def _determine_appropriate_level(self, heading: Heading, level_stack: List[int], 
-                                   previous_headings: List[Heading]) -> int:
-        """Determine the appropriate level for a heading based on context."""
-        target_level = heading.level
-        
-        # If this is the first heading, it should be H1
-        if not previous_headings:
-            return 1
-        
-        # Check if we can use the target level
-        if target_level == 1:
-            return 1  # H1 is always allowed
-        
-        elif target_level == 2:
-            # H2 requires at least one H1 before it
-            if any(h.level == 1 for h in previous_headings):
-                return 2
-            else:
-                return 1  # Promote to H1
-        
-        elif target_level == 3:
-            # H3 requires H2 in the current section
-            if level_stack and 2 in level_stack:
-                return 3
-            elif any(h.level <= 2 for h in previous_headings):
-                return 2  # Demote to H2
-            else:
-                return 1  # Demote to H1
-        
-        # Default fallback
-        return min(target_level, 3)
-    
-    def _update_level_stack(self, level_stack: List[int], new_level: int) -> None:
-        """Update the level stack to track current hierarchy."""
-        # Remove levels deeper than the new level
-        level_stack[:] = [level for level in level_stack if level < new_level]
-        
-        # Add the new level
-        if new_level not in level_stack:
-            level_stack.append(new_level)
+        columns.levels = adjusted_levels
+        columns.confidences[changed] *= 0.9
+        return headings
     
     def _build_hierarchy(self, headings: List[Heading]) -> Dict:
         """
@@ -176,16 +163,15 @@ class OutlineBuilder:
         
         return hierarchy
     
-    def _calculate_outline_metrics(self, outline: Outline) -> None:
-        """Calculate quality metrics for the outline."""
+    def _calculate_outline_metrics(self, outline: Outline, columns: HeadingColumns) -> None:
+        """Calculate quality metrics for the outline from its heading columns."""
         if not outline.headings:
             outline.average_confidence = 0.0
             outline.quality_score = 0.0
             return
         
         # Calculate average confidence
-        total_confidence = sum(h.confidence for h in outline.headings)
-        outline.average_confidence = total_confidence / len(outline.headings)
+        outline.average_confidence = float(columns.confidences.mean())
         
         # Calculate quality score based on various factors
         quality_factors = []
@@ -194,11 +180,11 @@ class OutlineBuilder:
         quality_factors.append(outline.average_confidence * 0.4)
         
         # Factor 2: Hierarchy balance (30% weight)
-        hierarchy_score = self._calculate_hierarchy_balance(outline.headings)
+        hierarchy_score = self._calculate_hierarchy_balance(columns.levels)
         quality_factors.append(hierarchy_score * 0.3)
         
         # Factor 3: Coverage (20% weight) - how well distributed across pages
-        coverage_score = self._calculate_page_coverage(outline.headings)
+        coverage_score = self._calculate_page_coverage(columns.pages)
         quality_factors.append(coverage_score * 0.2)
         
         # Factor 4: Consistency (10% weight) - similar patterns
@@ -210,20 +196,16 @@ class OutlineBuilder:
         logger.debug(f"Outline quality metrics - Confidence: {outline.average_confidence:.2f}, "
                     f"Quality: {outline.quality_score:.2f}")
     
-    def _calculate_hierarchy_balance(self, headings: List[Heading]) -> float:
-        """Calculate how well-balanced the heading hierarchy is."""
-        if not headings:
+    def _calculate_hierarchy_balance(self, levels: np.ndarray) -> float:
+        """Calculate how well-balanced the heading hierarchy is, from an array of heading levels."""
+        if not levels.size:
             return 0.0
         
         # Count headings by level
-        level_counts = defaultdict(int)
-        for heading in headings:
-            level_counts[heading.level] += 1
+        level_counts = np.bincount(levels, minlength=4)
         
         # Ideal ratios: more H1s than H2s, more H2s than H3s
-        h1_count = level_counts.get(1, 0)
-        h2_count = level_counts.get(2, 0)
-        h3_count = level_counts.get(3, 0)
+        h1_count, h2_count, h3_count = (int(c) for c in level_counts[1:4])
         
         if h1_count == 0:
             return 0.3  # No H1s is problematic
@@ -247,21 +229,19 @@ class OutlineBuilder:
         
         return min(score, 1.0)
     
-    def _calculate_page_coverage(self, headings: List[Heading]) -> float:
-        """Calculate how well headings are distributed across pages."""
-        if not headings:
+    def _calculate_page_coverage(self, pages: np.ndarray) -> float:
+        """Calculate how well headings are distributed across pages, from an array of page numbers."""
+        if not pages.size:
             return 0.0
         
         # Get page range
-        pages = [h.page for h in headings]
-        min_page, max_page = min(pages), max(pages)
-        total_pages = max_page - min_page + 1
+        total_pages = int(pages.max()) - int(pages.min()) + 1
         
         if total_pages <= 1:
             return 0.5  # Single page document
         
         # Calculate distribution
-        unique_pages = len(set(pages))
+        unique_pages = np.unique(pages).size
         coverage_ratio = unique_pages / total_pages
         
         # Score based on coverage
@@ -310,21 +290,8 @@ class OutlineBuilder:
     
     def _has_numbering(self, text: str) -> bool:
         """Check if heading text has numbering pattern."""
-        import re
-        numbering_patterns = [
-            r'^\d+\.',
-            r'^\d+\.\d+',
-            r'^[A-Z]\.',
-            r'^[IVX]+\.',
-            r'^\(\d+\)',
-            r'^Chapter\s+\d+',
-            r'^Section\s+\d+'
-        ]
-        
-        for pattern in numbering_patterns:
-            if re.match(pattern, text.strip()):
-                return True
-        return False
+        text = text.strip()
+        return any(pattern.match(text) for pattern in _NUMBERING_PATTERNS)
     
     def get_outline_summary(self, outline: Outline) -> Dict:
         """Generate a summary of the outline structure."""
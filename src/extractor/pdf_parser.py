@@ -3,20 +3,59 @@ PDF Parser - Extract text, font information, and layout data from PDF files.
 Includes OCR fallback for scanned documents.
 """
 
+import math
 import logging
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Tuple
+from bisect import bisect_right
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
 import numpy as np
 import pytesseract
 from PIL import Image
-import io
 
 from models.document import Document, TextBlock, FontInfo
 from config.settings import Settings
+from .utils import otsu_binarize
 
 logger = logging.getLogger(__name__)
 
+# Pages handed to a worker process at a time when a PDF is parsed in parallel
+PAGES_PER_TASK = 8
+
+# Scanned pages are OCR'd together in mosaics up to this many pixels tall
+# (Tesseract rejects images above 32767 px), separated by white strips
+OCR_MOSAIC_MAX_HEIGHT = 30000
+OCR_PAGE_GAP = 64
+
+# Pages larger than this many pixels (at OCR_DPI) in either dimension are rendered
+# and OCR'd one tile at a time, so one oversized page can't exhaust a worker's memory.
+# Neighbouring tiles overlap by OCR_TILE_OVERLAP pixels so words on a tile edge are
+# seen whole by one of them
+OCR_TILE_SIZE = 4096
+OCR_TILE_OVERLAP = 128
+
+
+@lru_cache(maxsize=256)
+def _rgb_to_hex(color_int: int) -> str:
+    """Convert RGB integer to hex color string (cached: documents use a handful of colors)."""
+    try:
+        return "#" + (color_int & 0xFFFFFF).to_bytes(3, "big").hex()
+    except:
+        return "#000000"
+
+
+def _parse_page_range(task) -> List[TextBlock]:
+    """
+    Parse one range of pages in a worker process, which opens its own handle
+    on the PDF. `task` is (pdf_path, settings, first_page, end_page).
+    """
+    pdf_path, settings, first_page, end_page = task
+    with fitz.open(pdf_path) as pdf_doc:
+        return PDFParser(settings)._parse_pages(pdf_doc, first_page, end_page)
+
+
 class PDFParser:
     """
     High-performance PDF parser that extracts text blocks with detailed
@@ -38,21 +77,16 @@ class PDFParser:
                 document.page_count = len(pdf_doc)
                 document.page_dimensions = [(page.rect.width, page.rect.height) for page in pdf_doc]
                 
-                all_text_blocks = []
-                for page_num, page in enumerate(pdf_doc):
-                    page_number = page_num + 1
-                    text_blocks = self._extract_text_blocks_from_page(page, page_number)
-                    
-                    # If a page has very little text, it's likely scanned. Try OCR.
-                    total_text_length = sum(len(block.text) for block in text_blocks)
-                    if total_text_length < 50: # Threshold for considering a page "scanned"
-                        logger.debug(f"Page {page_number} has little text. Attempting OCR...")
-                        ocr_blocks = self._ocr_page(page, page_number)
-                        all_text_blocks.extend(ocr_blocks)
-                    else:
-                        all_text_blocks.extend(text_blocks)
-                        
-                document.text_blocks = all_text_blocks
+                tasks = [(str(pdf_path), self.settings, start, min(start + PAGES_PER_TASK, document.page_count))
+                         for start in range(0, document.page_count, PAGES_PER_TASK)]
+                workers = min(self.settings.PAGE_WORKERS, len(tasks))
+                if workers > 1:
+                    # Pages (and their OCR) are independent, so page ranges are parsed in worker processes
+                    with ProcessPoolExecutor(max_workers=workers) as executor:
+                        document.text_blocks = [block for blocks in executor.map(_parse_page_range, tasks)
+                                                for block in blocks]
+                else:
+                    document.text_blocks = self._parse_pages(pdf_doc, 0, document.page_count)
 
             self._calculate_document_stats(document)
             logger.info(f"Parsed {len(document.text_blocks)} text blocks from {document.page_count} pages")
@@ -62,90 +96,253 @@ class PDFParser:
             logger.error(f"Failed to parse PDF {pdf_path}: {str(e)}")
             raise
 
-    def _extract_text_blocks_from_page(self, page: fitz.Page, page_num: int) -> List[TextBlock]:
-        """Extracts text directly from the PDF's text layer."""
+    def _parse_pages(self, pdf_doc: fitz.Document, first_page: int, end_page: int) -> List[TextBlock]:
+        """
+        Extract the text blocks of pages [first_page, end_page), falling back to
+        OCR for pages that look scanned. All scanned pages of the range are OCR'd
+        together (see `_ocr_pages`).
+        """
+        page_blocks = {}
+        scanned_pages = []
+        for page_num in range(first_page, end_page):
+            page = pdf_doc[page_num]
+            page_number = page_num + 1
+            text_blocks, total_text_length = self._extract_text_blocks_from_page(page, page_number)
+            
+            # If a page has very little text, it's likely scanned. Try OCR.
+            if total_text_length < 50: # Threshold for considering a page "scanned"
+                logger.debug(f"Page {page_number} has little text. Attempting OCR...")
+                scanned_pages.append(page_number)
+                page_blocks[page_number] = []
+            else:
+                page_blocks[page_number] = text_blocks
+        
+        if scanned_pages:
+            page_blocks.update(self._ocr_pages(pdf_doc, scanned_pages))
+        return [block for page_number in range(first_page + 1, end_page + 1) for block in page_blocks[page_number]]
+
+    def _extract_text_blocks_from_page(self, page: fitz.Page, page_num: int) -> Tuple[List[TextBlock], int]:
+        """
+        Extracts text directly from the PDF's text layer. Image blocks are not
+        extracted at all, and spans with the same font share one FontInfo.
+        Returns the blocks and their total text length, counted along the way.
+        """
         text_blocks = []
+        total_length = 0
+        fonts = {}  # (font, size, flags, color) -> FontInfo
         try:
-            blocks = page.get_text("dict").get("blocks", [])
+            blocks = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]
             for block in blocks:
                 if "lines" not in block: continue
                 for line in block["lines"]:
-                    for span in line.get("spans", []):
-                        text = span.get("text", "").strip()
-                        if not text: continue
+                    # Whitespace between the previous kept span and the next one
+                    separator = "\n"
+                    for span in line["spans"]:
+                        raw_text = span["text"]
+                        text = raw_text.strip()
+                        if not text:
+                            if raw_text and not separator:
+                                separator = " "
+                            continue
+                        if not separator and raw_text[0].isspace():
+                            separator = " "
+                        total_length += len(text)
                         
-                        font_info = FontInfo(
-                            family=span.get("font", "Unknown"),
-                            size=span.get("size", 12.0),
-                            flags=span.get("flags", 0),
-                            color=self._rgb_to_hex(span.get("color", 0))
-                        )
-                        bbox = span.get("bbox", (0, 0, 0, 0))
+                        font_key = (span["font"], span["size"], span["flags"], span["color"])
+                        font_info = fonts.get(font_key)
+                        if font_info is None:
+                            font_info = fonts[font_key] = FontInfo(
+                                family=font_key[0], size=font_key[1], flags=font_key[2],
+                                color=_rgb_to_hex(font_key[3])
+                            )
+                        x0, y0, x1, y1 = span["bbox"]
                         
                         text_blocks.append(TextBlock(
-                            text=text, page=page_num, x=bbox[0], y=bbox[1],
-                            width=bbox[2] - bbox[0], height=bbox[3] - bbox[1],
-                            font_info=font_info
+                            text=text, page=page_num, x=x0, y=y0,
+                            width=x1 - x0, height=y1 - y0,
+                            font_info=font_info, separator=separator
                         ))
+                        separator = " " if raw_text[-1].isspace() else ""
         except Exception as e:
             logger.warning(f"Error extracting direct text from page {page_num}: {str(e)}")
-        return text_blocks
+        return text_blocks, total_length
 
-    def _ocr_page(self, page: fitz.Page, page_num: int) -> List[TextBlock]:
+    def _ocr_tiles(self, page: fitz.Page) -> List[Tuple[fitz.Rect, Optional[fitz.Rect]]]:
+        """
+        Split a page into the regions rendered for OCR, as (clip, core) pairs: the
+        whole page with no core, or for oversized pages an even grid of cores, each
+        rendered with OCR_TILE_OVERLAP pixels of its neighbours around it so the
+        clip is at most OCR_TILE_SIZE pixels on a side.
+        A word is kept only by the tile whose core contains its center.
         """
-        Performs OCR on a page image to extract text from scanned documents.
-        NOTE: This loses detailed font and position info for individual words.
+        rect = page.rect
+        points_per_pixel = 72.0 / self.settings.OCR_DPI
+        if max(rect.width, rect.height) <= OCR_TILE_SIZE * points_per_pixel:
+            return [(rect, None)]
+        overlap = OCR_TILE_OVERLAP * points_per_pixel
+        step = (OCR_TILE_SIZE - 2 * OCR_TILE_OVERLAP) * points_per_pixel
+        cols, rows = math.ceil(rect.width / step), math.ceil(rect.height / step)
+        width, height = rect.width / cols, rect.height / rows
+        tiles = []
+        for row in range(rows):
+            for col in range(cols):
+                core = fitz.Rect(rect.x0 + col * width, rect.y0 + row * height,
+                                 rect.x0 + (col + 1) * width, rect.y0 + (row + 1) * height)
+                clip = fitz.Rect(core.x0 - overlap, core.y0 - overlap,
+                                 core.x1 + overlap, core.y1 + overlap) & rect
+                tiles.append((clip, core))
+        return tiles
+
+    def _render_for_ocr(self, page: fitz.Page, clip: fitz.Rect = None) -> np.ndarray:
         """
-        ocr_blocks = []
+        Render a page (or the `clip` region of it) straight to a grayscale array
+        (no PNG encode/decode round-trip), binarized with Otsu's threshold if
+        OCR_PREPROCESS is set.
+        The pixmap is released and MuPDF's resource store emptied right away, so
+        rendering a long scanned PDF doesn't keep every page's images cached.
+        """
+        pix = page.get_pixmap(dpi=self.settings.OCR_DPI, colorspace=fitz.csGRAY, alpha=False, clip=clip)
+        gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+        pix = None
+        fitz.TOOLS.store_shrink(100)
+        return otsu_binarize(gray) if self.settings.OCR_PREPROCESS else gray
+
+    def _ocr_pages(self, pdf_doc: fitz.Document, page_numbers: List[int]) -> Dict[int, List[TextBlock]]:
+        """
+        Performs OCR on scanned pages, stacking their images into tall mosaics so
+        Tesseract starts (and loads its model) once per mosaic instead of once per
+        page. Oversized pages (see `_ocr_tiles`) are OCR'd one tile at a time
+        instead, so only one tile's image is held at once.
+        Returns the OCR'd line blocks of each page.
+        """
+        ocr_blocks = {page_number: [] for page_number in page_numbers}
+        batch, batch_height = [], 0
+
+        def flush():
+            for page_number, blocks in self._ocr_mosaic(batch).items():
+                ocr_blocks[page_number].extend(blocks)
+
+        for page_number in page_numbers:
+            try:
+                page = pdf_doc[page_number - 1]
+                tiles = self._ocr_tiles(page)
+                if len(tiles) > 1:
+                    for clip, core in tiles:
+                        image = self._render_for_ocr(page, clip)
+                        ocr_blocks[page_number].extend(
+                            self._ocr_mosaic([(page_number, clip, core, image)])[page_number])
+                        image = None
+                    continue
+                clip, core = tiles[0]
+                image = self._render_for_ocr(page, clip)
+                if batch and batch_height + image.shape[0] > OCR_MOSAIC_MAX_HEIGHT:
+                    flush()
+                    batch, batch_height = [], 0
+                batch.append((page_number, clip, core, image))
+                batch_height += image.shape[0] + OCR_PAGE_GAP
+            except Exception as e:
+                logger.error(f"OCR failed for page {page_number}: {e}")
+        if batch:
+            flush()
+        return ocr_blocks
+
+    def _ocr_mosaic(self, pages: List[Tuple[int, fitz.Rect, Optional[fitz.Rect], np.ndarray]]) -> Dict[int, List[TextBlock]]:
+        """
+        Runs Tesseract once over page images stacked vertically (separated by white
+        strips) and maps each recognized line back to its page by its top offset.
+        Each image comes with the page-space region it shows and, for a tile, the
+        core region whose words it keeps (see `_ocr_tiles`).
+        OCR doesn't give us font info, so lines get default font properties; their
+        positions are converted from pixels back to PDF points.
+        """
+        page_numbers = [page_number for page_number, _, _, _ in pages]
+        offsets = []
+        top = 0
+        for _, _, _, image in pages:
+            offsets.append(top)
+            top += image.shape[0] + OCR_PAGE_GAP
+        if len(pages) == 1:
+            mosaic = pages[0][3]
+        else:
+            mosaic = np.full((top - OCR_PAGE_GAP, max(image.shape[1] for _, _, _, image in pages)), 255, dtype=np.uint8)
+            for offset, (_, _, _, image) in zip(offsets, pages):
+                mosaic[offset:offset + image.shape[0], :image.shape[1]] = image
+
+        ocr_blocks = {page_number: [] for page_number in page_numbers}
         try:
-            # Render page to an image
-            pix = page.get_pixmap(dpi=300)
-            img = Image.open(io.BytesIO(pix.tobytes()))
-            
-            # Use pytesseract to get text data
-            ocr_text = pytesseract.image_to_string(img)
-            
-            if ocr_text.strip():
-                # Since OCR doesn't give us font info, we create one large text block
-                # for the whole page with default font properties.
-                default_font = FontInfo(family="OCR", size=12.0, flags=0, color="#000000")
-                page_width, page_height = page.rect.width, page.rect.height
-                
-                # We can split the text by line to create multiple blocks
-                for line in ocr_text.splitlines():
-                    if line.strip():
-                        ocr_blocks.append(TextBlock(
-                            text=line.strip(),
-                            page=page_num,
-                            x=0, y=0, # Position is unknown from OCR
-                            width=page_width, height=12, # A-best guess for height
-                            font_info=default_font
-                        ))
-                logger.debug(f"Successfully extracted {len(ocr_blocks)} lines of text via OCR from page {page_num}")
+            data = pytesseract.image_to_data(
+                Image.fromarray(mosaic), config=self.settings.OCR_TESSERACT_CONFIG,
+                output_type=pytesseract.Output.DICT
+            )
         except Exception as e:
-            logger.error(f"OCR failed for page {page_num}: {e}")
+            logger.error(f"OCR failed for pages {page_numbers}: {e}")
+            return ocr_blocks
+
+        # Group recognized words into lines: (page index, block, paragraph, line) -> words and bbox
+        scale = 72.0 / self.settings.OCR_DPI
+        lines = {}
+        for i, word in enumerate(data["text"]):
+            word = word.strip()
+            if not word:
+                continue
+            left, top, width, height = data["left"][i], data["top"][i], data["width"][i], data["height"][i]
+            index = bisect_right(offsets, top) - 1
+            _, clip, core, _ = pages[index]
+            if core is not None:
+                # Words in a tile's overlap belong to the neighbouring tile
+                center_x = clip.x0 + (left + width / 2) * scale
+                center_y = clip.y0 + (top - offsets[index] + height / 2) * scale
+                if not (core.x0 <= center_x < core.x1 and core.y0 <= center_y < core.y1):
+                    continue
+            key = (index, data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            if key not in lines:
+                lines[key] = ([], [left, top, left + width, top + height])
+            words, box = lines[key]
+            words.append(word)
+            box[0], box[1] = min(box[0], left), min(box[1], top)
+            box[2], box[3] = max(box[2], left + width), max(box[3], top + height)
+
+        default_font = FontInfo(family="OCR", size=12.0, flags=0, color="#000000")
+        for (index, _, _, _), (words, (x0, y0, x1, y1)) in lines.items():
+            page_number, clip, _, _ = pages[index]
+            ocr_blocks[page_number].append(TextBlock(
+                text=" ".join(words),
+                page=page_number,
+                x=clip.x0 + x0 * scale, y=clip.y0 + (y0 - offsets[index]) * scale,
+                width=(x1 - x0) * scale, height=(y1 - y0) * scale,
+                font_info=default_font
+            ))
+        logger.debug(f"Extracted {len(lines)} lines of text via OCR from pages {page_numbers}")
         return ocr_blocks
 
 
     def _calculate_document_stats(self, document: Document) -> None:
-        """Calculate document-wide statistics for heading detection."""
+        """
+        Calculate document-wide statistics for heading detection. Font sizes and
+        interned font-family ids are gathered into arrays in one pass; OCR blocks
+        (which have no real font info) are masked out.
+        """
         if not document.text_blocks: return
         
-        font_sizes = [b.font_info.size for b in document.text_blocks if b.font_info.size > 0 and b.font_info.family != "OCR"]
-        document.avg_font_size = np.mean(font_sizes) if font_sizes else 12.0
+        count = len(document.text_blocks)
+        family_ids = {}  # family name -> id, in order of first appearance
+        sizes = np.fromiter((b.font_info.size for b in document.text_blocks), dtype=np.float64, count=count)
+        families = np.fromiter((family_ids.setdefault(b.font_info.family, len(family_ids)) for b in document.text_blocks),
+                               dtype=np.int64, count=count)
+        not_ocr = families != family_ids.get("OCR", -1)
         
-        font_families = [b.font_info.family for b in document.text_blocks if b.font_info.family != "OCR"]
-        if font_families:
-            from collections import Counter
-            document.primary_font = Counter(font_families).most_common(1)[0][0]
+        font_sizes = sizes[not_ocr & (sizes > 0)]
+        if font_sizes.size:
+            document.avg_font_size = font_sizes.mean()
+            document.median_font_size = float(np.median(font_sizes))
+            document.font_size_std = float(font_sizes.std())
+        else:
+            document.avg_font_size = 12.0
         
-        logger.debug(f"Document stats - Avg font size: {document.avg_font_size:.1f}, Primary font: {document.primary_font}")
-
-
-    def _rgb_to_hex(self, color_int: int) -> str:
-        """Convert RGB integer to hex color string."""
-        try:
-            r, g, b = (color_int >> 16) & 0xFF, (color_int >> 8) & 0xFF, color_int & 0xFF
-            return f"#{r:02x}{g:02x}{b:02x}"
-        except:
-            return "#000000"
\ No newline at end of file
+        font_families = families[not_ocr]
+        if font_families.size:
+            # argmax returns the first id among ties, i.e. the family seen first
+            names = list(family_ids)
+            document.primary_font = names[int(np.bincount(font_families).argmax())]
+        
+        logger.debug(f"Document stats - Avg font size: {document.avg_font_size:.1f}, Primary font: {document.primary_font}")
\ No newline at end of file
@@ -3,13 +3,62 @@ Utility functions for PDF extraction and text processing.
 """
 
 import re
+import sys
 import logging
+from functools import lru_cache
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
-import hashlib
+import numpy as np
+import xxhash
 
 logger = logging.getLogger(__name__)
 
+# Regular expressions used below, compiled once at import
+_WS_RE = re.compile(r'\s+')
+# Control characters and the Latin-1 range, deleted by clean_text via str.translate
+_CTRL_TABLE = dict.fromkeys([*range(0x00, 0x09), 0x0b, 0x0c, *range(0x0e, 0x20), *range(0x7f, 0x100)])
+
+# Common UTF-8-as-Latin-1 mojibake, fixed in one pass; the alternation tries keys in
+# this order, matching the order the fixes were applied in
+_MOJIBAKE_REPLACEMENTS = {
+    'â€™': "'",
+    'â€œ': '"',
+    'â€': '"',
+    'â€"': '–',
+}
+_MOJIBAKE_RE = re.compile('|'.join(map(re.escape, _MOJIBAKE_REPLACEMENTS)))
+_FONT_SUBSET_RE = re.compile(r'^[A-Z]{6}\+')
+_FONT_VARIANT_RE = re.compile(r'[,\-].*$')
+
+# Common font name mappings
+_FONT_NAME_MAPPINGS = {
+    'Timesnewroman': 'Times New Roman',
+    'Timesnewromanps': 'Times New Roman',
+    'Arialmt': 'Arial',
+    'Helvetica': 'Arial',  # Treat as similar
+    'Calibri': 'Calibri',
+}
+
+_NUMBERING_PATTERNS = tuple((re.compile(pattern, re.IGNORECASE), pattern_type) for pattern, pattern_type in (
+    (r'^(\d+\.)\s*(.+)', 'decimal'),
+    (r'^(\d+\.\d+)\s*(.+)', 'decimal_sub'),
+    (r'^(\d+\.\d+\.\d+)\s*(.+)', 'decimal_subsub'),
+    (r'^([A-Z]\.)\s*(.+)', 'alpha'),
+    (r'^([IVX]+\.)\s*(.+)', 'roman'),
+    (r'^(\(\d+\))\s*(.+)', 'parenthetical'),
+    (r'^(Chapter\s+\d+)\s*(.+)', 'chapter'),
+    (r'^(Section\s+\d+)\s*(.+)', 'section'),
+))
+
+# Header/footer patterns as one alternation, so each block is matched in a single pass
+_HEADER_FOOTER_RE = re.compile('|'.join((
+    r'\d+\s*$',  # Page numbers
+    r'Page\s+\d+',
+    r'Chapter\s+\d+\s*$',
+    r'\w+\s+\d{4}$',  # Date patterns
+    r'©.*\d{4}',  # Copyright
+)), re.IGNORECASE)
+
 
 def clean_text(text: str) -> str:
     """
@@ -25,29 +74,46 @@ def clean_text(text: str) -> str:
         return ""
     
     # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
+    text = _WS_RE.sub(' ', text)
     
     # Remove common PDF artifacts
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\xff]', '', text)
+    text = text.translate(_CTRL_TABLE)
     
     # Fix common encoding issues
-    replacements = {
-        'â€™': "'",
-        'â€œ': '"',
-        'â€': '"',
-        'â€"': '—',
-        'â€"': '–',
-    }
-    
-    for old, new in replacements.items():
-        text = text.replace(old, new)
+    text = _MOJIBAKE_RE.sub(lambda match: _MOJIBAKE_REPLACEMENTS[match.group(0)], text)
     
     return text.strip()
 
 
+def otsu_binarize(gray: np.ndarray) -> np.ndarray:
+    """
+    Binarize a grayscale image with Otsu's global threshold.
+    
+    Args:
+        gray: 2-D uint8 image array
+        
+    Returns:
+        uint8 array with pixels above the threshold set to 255 and the rest to 0
+    """
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weight_below = np.cumsum(hist)
+    weight_above = gray.size - weight_below
+    mass_below = np.cumsum(hist * np.arange(256))
+    
+    # Between-class variance for every candidate threshold (unnormalized)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (mass_below[-1] * weight_below - mass_below * gray.size) ** 2 / (weight_below * weight_above)
+    threshold = int(np.argmax(np.nan_to_num(variance, nan=0.0, posinf=0.0)))
+    
+    return np.where(gray > threshold, 255, 0).astype(np.uint8)
+
+
+@lru_cache(maxsize=1024)
 def normalize_font_name(font_name: str) -> str:
     """
     Normalize font names for consistent comparison.
+    Results are cached and interned: a document uses a few dozen distinct fonts
+    across thousands of spans.
     
     Args:
         font_name: Raw font name from PDF
@@ -59,22 +125,13 @@ def normalize_font_name(font_name: str) -> str:
         return "Unknown"
     
     # Remove common prefixes and suffixes
-    font_name = re.sub(r'^[A-Z]{6}\+', '', font_name)  # Remove subset prefix
-    font_name = re.sub(r'[,\-].*$', '', font_name)     # Remove variants
+    font_name = _FONT_SUBSET_RE.sub('', font_name)  # Remove subset prefix
+    font_name = _FONT_VARIANT_RE.sub('', font_name)     # Remove variants
     
     # Normalize case
     font_name = font_name.title()
     
-    # Common font name mappings
-    mappings = {
-        'Timesnewroman': 'Times New Roman',
-        'Timesnewromanps': 'Times New Roman',
-        'Arialmt': 'Arial',
-        'Helvetica': 'Arial',  # Treat as similar
-        'Calibri': 'Calibri',
-    }
-    
-    return mappings.get(font_name, font_name)
+    return sys.intern(_FONT_NAME_MAPPINGS.get(font_name, font_name))
 
 
 def calculate_text_similarity(text1: str, text2: str) -> float:
@@ -120,19 +177,9 @@ def extract_numbering_pattern(text: str) -> Optional[Tuple[str, str]]:
     Returns:
         Tuple of (numbering, remaining_text) or None
     """
-    patterns = [
-        (r'^(\d+\.)\s*(.+)', 'decimal'),
-        (r'^(\d+\.\d+)\s*(.+)', 'decimal_sub'),
-        (r'^(\d+\.\d+\.\d+)\s*(.+)', 'decimal_subsub'),
-        (r'^([A-Z]\.)\s*(.+)', 'alpha'),
-        (r'^([IVX]+\.)\s*(.+)', 'roman'),
-        (r'^(\(\d+\))\s*(.+)', 'parenthetical'),
-        (r'^(Chapter\s+\d+)\s*(.+)', 'chapter'),
-        (r'^(Section\s+\d+)\s*(.+)', 'section'),
-    ]
-    
-    for pattern, pattern_type in patterns:
-        match = re.match(pattern, text.strip(), re.IGNORECASE)
+    text = text.strip()
+    for pattern, pattern_type in _NUMBERING_PATTERNS:
+        match = pattern.match(text)
         if match:
             return (match.group(1), match.group(2).strip())
     
@@ -154,18 +201,7 @@ def is_likely_page_header_footer(text: str, page_height: float, y_position: floa
     # Check position (top 10% or bottom 10% of page)
     if y_position < page_height * 0.1 or y_position > page_height * 0.9:
         # Check for common header/footer patterns
-        header_footer_patterns = [
-            r'^\d+$',  # Page numbers
-            r'^Page\s+\d+',
-            r'^\d+\s*$',
-            r'^Chapter\s+\d+\s*$',
-            r'^\w+\s+\d{4}$',  # Date patterns
-            r'^©.*\d{4}',  # Copyright
-        ]
-        
-        for pattern in header_footer_patterns:
-            if re.match(pattern, text.strip(), re.IGNORECASE):
-                return True
+        return _HEADER_FOOTER_RE.match(text.strip()) is not None
     
     return False
 
@@ -180,18 +216,19 @@ def calculate_reading_order_score(blocks: List[Any]) -> List[Tuple[Any, float]]:
     Returns:
         List of (block, score) tuples sorted by reading order
     """
-    scored_blocks = []
+    if not blocks:
+        return []
     
-    for block in blocks:
-        # Primary sort: top to bottom (y position)
-        # Secondary sort: left to right (x position)
-        score = block.y * 1000 + block.x
-        scored_blocks.append((block, score))
+    # Primary sort: top to bottom (y position)
+    # Secondary sort: left to right (x position)
+    ys = np.fromiter((block.y for block in blocks), dtype=np.float64, count=len(blocks))
+    xs = np.fromiter((block.x for block in blocks), dtype=np.float64, count=len(blocks))
+    scores = ys * 1000 + xs
     
-    # Sort by score (reading order)
-    scored_blocks.sort(key=lambda x: x[1])
+    # Sort by score (reading order); stable, like list.sort
+    order = np.argsort(scores, kind='stable')
     
-    return scored_blocks
+    return [(blocks[i], scores[i].item()) for i in order.tolist()]
 
 
 def generate_content_hash(text: str) -> str:
@@ -202,10 +239,11 @@ def generate_content_hash(text: str) -> str:
         text: Text content
         
     Returns:
-        SHA-256 hash of the text
+        64-bit xxh3 hash of the normalized text, as 16 hex digits
     """
-    normalized_text = re.sub(r'\s+', ' ', text.lower().strip())
-    return hashlib.sha256(normalized_text.encode('utf-8')).hexdigest()[:16]
+    # A non-cryptographic hash is enough for duplicate detection, and far faster than SHA-256
+    normalized_text = _WS_RE.sub(' ', text.lower().strip())
+    return xxhash.xxh3_64_hexdigest(normalized_text.encode('utf-8'))
 
 
 def validate_pdf_file(file_path: Path) -> bool:
@@ -6,7 +6,9 @@ import logging
 import argparse
 from pathlib import Path
 import os
-import json
+import orjson
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 # Corrected import path for the new Settings structure
 from config.settings import Settings
@@ -25,43 +27,70 @@ logging.getLogger("pdfminer").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 
+# Extractor components, created once in each worker process by `_init_worker`
+_components = None
+
+
+def _init_worker(settings: Settings):
+    global _components
+    _components = (PDFParser(settings), HeadingDetector(settings), OutlineBuilder(settings))
+
+
+def _process_one(pdf_path: Path, output_dir: Path):
+    """
+    Extract the outline of one PDF in a worker process and write it as JSON.
+    """
+    pdf_parser, heading_detector, outline_builder = _components
+    try:
+        logger.info(f"Processing file: {pdf_path.name}")
+        
+        document = pdf_parser.parse(pdf_path)
+        headings = heading_detector.detect_headings(document)
+        outline = outline_builder.build_outline(headings)
+        
+        output_data = {
+            "title": document.filename,
+            "outline": outline.to_output_entries()
+        }
+        
+        output_path = output_dir / f"{pdf_path.stem}_outline.json"
+        with open(output_path, 'wb') as f:
+            f.write(orjson.dumps(output_data, option=orjson.OPT_INDENT_2))
+
+        logger.info(f"Successfully generated outline for {pdf_path.name}")
+
+    except Exception as e:
+        logger.error(f"Failed to process {pdf_path.name}: {e}", exc_info=True)
+
+
 def process_pdfs(input_dir: Path, output_dir: Path, settings: Settings):
     """
-    Process all PDF files in the input directory.
+    Process all PDF files in the input directory, one worker process per CPU core.
     """
-    pdf_files = list(input_dir.glob("*.pdf"))
+    # One scandir pass; DirEntry.is_file() reuses the directory listing's file type
+    with os.scandir(input_dir) as entries:
+        pdf_files = [Path(entry.path) for entry in entries
+                     if entry.is_file() and entry.name.lower().endswith(".pdf")]
     if not pdf_files:
         logger.warning(f"No PDF files found in {input_dir}")
         return
         
     logger.info(f"Found {len(pdf_files)} PDF files to process.")
     
-    # Initialize components with the loaded settings
-    pdf_parser = PDFParser(settings)
-    heading_detector = HeadingDetector(settings)
-    outline_builder = OutlineBuilder(settings)
+    cores = os.cpu_count() or 1
+    if len(pdf_files) == 1:
+        # A single PDF is processed here, with its pages spread over the cores
+        settings.PAGE_WORKERS = cores
+        _init_worker(settings)
+        _process_one(pdf_files[0], output_dir)
+        return
     
-    for pdf_path in pdf_files:
-        try:
-            logger.info(f"Processing file: {pdf_path.name}")
-            
-            document = pdf_parser.parse(pdf_path)
-            headings = heading_detector.detect_headings(document)
-            outline = outline_builder.build_outline(headings)
-            
-            output_data = {
-                "title": document.filename,
-                "outline": [{"level": f"H{h.level}", "text": h.text, "page": h.page} for h in outline.headings]
-            }
-            
-            output_path = output_dir / f"{pdf_path.stem}_outline.json"
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, indent=4)
-
-            logger.info(f"Successfully generated outline for {pdf_path.name}")
-
-        except Exception as e:
-            logger.error(f"Failed to process {pdf_path.name}: {e}", exc_info=True)
+    # PDFs are spread across processes, so each one parses its pages sequentially
+    settings.PAGE_WORKERS = 1
+    # PyMuPDF isn't safe to use from several threads, so files go to separate processes
+    with ProcessPoolExecutor(max_workers=min(cores, len(pdf_files)), initializer=_init_worker,
+                             initargs=(settings,)) as executor:
+        list(executor.map(partial(_process_one, output_dir=output_dir), pdf_files))
 
 
 if __name__ == "__main__":
@@ -3,6 +3,6 @@ Data models for PDF Outline Extractor.
 """
 
 from .document import Document, TextBlock, FontInfo
-from .outline import Outline, Heading
+from .outline import Outline, Heading, HeadingColumns
 
-__all__ = ["Document", "TextBlock", "FontInfo", "Outline", "Heading"]
\ No newline at end of file
+__all__ = ["Document", "TextBlock", "FontInfo", "Outline", "Heading", "HeadingColumns"]
\ No newline at end of file
@@ -1,12 +1,15 @@
 """
 Data models for representing a parsed PDF document and its components.
+
+The models use __slots__: documents hold thousands of blocks, and slots drop
+each instance's __dict__ and speed up attribute access.
 """
 
 from dataclasses import dataclass, field
 from typing import List, Tuple
 from datetime import datetime
 
-@dataclass
+@dataclass(slots=True)
 class FontInfo:
     """Stores information about the font used in a text block."""
     family: str
@@ -14,7 +17,11 @@ class FontInfo:
     flags: int
     color: str
 
-@dataclass
+    def to_dict(self) -> dict:
+        """Convert font info to dictionary representation."""
+        return {'family': self.family, 'size': self.size, 'flags': self.flags, 'color': self.color}
+
+@dataclass(slots=True)
 class TextBlock:
     """Represents a block of text extracted from a PDF page."""
     text: str
@@ -24,8 +31,11 @@ class TextBlock:
     width: float
     height: float
     font_info: FontInfo
+    # Whitespace that preceded this text in the page's text layer: "\n" at the start
+    # of a line, " " between words, "" where a word continues from the previous span
+    separator: str = "\n"
 
-@dataclass
+@dataclass(slots=True)
 class Document:
     """Represents a complete parsed PDF document."""
     filename: str
@@ -2,15 +2,42 @@
 Outline data models for representing hierarchical document structure.
 
 This module defines data structures for headings and outline hierarchies
-extracted from PDF documents.
+extracted from PDF documents. Heading and Outline use __slots__, like the
+document models.
 """
 
 from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from numba import njit
 from .document import FontInfo
 
 
-@dataclass
+# Table of contents indentation for H1, H2 and H3
+_TOC_INDENTS = ("", "  ", "    ")
+
+
+@njit(cache=True)
+def _parents_from_levels(levels: np.ndarray) -> np.ndarray:
+    """
+    Index of each heading's parent (-1 for roots), from heading levels in
+    reading order: the nearest earlier heading with a lower level that is still
+    open. JIT-compiled so the stack loop runs on unboxed integers.
+    """
+    count = levels.shape[0]
+    parents = np.empty(count, dtype=np.int64)
+    stack = np.empty(count, dtype=np.int64)  # Indices of potential parents
+    top = 0
+    for i in range(count):
+        while top > 0 and levels[stack[top - 1]] >= levels[i]:
+            top -= 1
+        parents[i] = stack[top - 1] if top > 0 else -1
+        stack[top] = i
+        top += 1
+    return parents
+
+
+@dataclass(slots=True)
 class Heading:
     """
     Represents a detected heading with metadata and confidence information.
@@ -24,9 +51,13 @@ class Heading:
     
     # Optional metadata
     numbering: Optional[str] = None  # e.g., "1.1", "A.", "Chapter 1"
-    parent_heading: Optional['Heading'] = None
     children: List['Heading'] = field(default_factory=list)
     
+    # (parent, index in the parent's children), kept by add_child/remove_child
+    _parent_ref: Optional[Tuple['Heading', int]] = field(default=None, init=False, repr=False, compare=False)
+    # Cached depth in the hierarchy; set by `depth` and reset by add_child/remove_child
+    _depth: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+    
     def __post_init__(self):
         """Post-initialization processing."""
         # Clean up text
@@ -64,6 +95,11 @@ class Heading:
         """Check if heading has numbering pattern."""
         return self.numbering is not None
     
+    @property
+    def parent_heading(self) -> Optional['Heading']:
+        """The parent heading, or None for a root heading."""
+        return self._parent_ref[0] if self._parent_ref is not None else None
+    
     @property
     def has_children(self) -> bool:
         """Check if heading has child headings."""
@@ -71,13 +107,32 @@ class Heading:
     
     @property
     def depth(self) -> int:
-        """Get the depth of this heading in the hierarchy."""
-        depth = 0
-        current = self.parent_heading
-        while current is not None:
-            depth += 1
-            current = current.parent_heading
-        return depth
+        """
+        Get the depth of this heading in the hierarchy.
+        Walks up only to the nearest ancestor with a cached depth, and caches the
+        depths of every heading on the way.
+        """
+        if self._depth is None:
+            path = []
+            current = self
+            while current is not None and current._depth is None:
+                path.append(current)
+                current = current.parent_heading
+            depth = -1 if current is None else current._depth
+            for heading in reversed(path):
+                depth += 1
+                heading._depth = depth
+        return self._depth
+    
+    def _set_depth(self, depth: int) -> None:
+        """Cache a new depth, clearing the cached depths below this heading if it changed."""
+        if self._depth != depth:
+            stack = list(self.children)
+            while stack:
+                descendant = stack.pop()
+                descendant._depth = None
+                stack.extend(descendant.children)
+            self._depth = depth
     
     def add_child(self, child: 'Heading') -> None:
         """
@@ -86,19 +141,26 @@ class Heading:
         Args:
             child: Child heading to add
         """
-        child.parent_heading = self
+        child._parent_ref = (self, len(self.children))
+        child._set_depth(self.depth + 1)
         self.children.append(child)
     
     def remove_child(self, child: 'Heading') -> None:
         """
-        Remove a child heading.
+        Remove a child heading. The child's stored index locates it directly;
+        only the later siblings' indices are updated.
         
         Args:
             child: Child heading to remove
         """
-        if child in self.children:
-            child.parent_heading = None
-            self.children.remove(child)
+        if child._parent_ref is None or child._parent_ref[0] is not self:
+            return
+        index = child._parent_ref[1]
+        del self.children[index]
+        for i in range(index, len(self.children)):
+            self.children[i]._parent_ref = (self, i)
+        child._parent_ref = None
+        child._set_depth(0)
     
     def get_all_descendants(self) -> List['Heading']:
         """
@@ -123,8 +185,9 @@ class Heading:
         path = []
         current = self
         while current is not None:
-            path.insert(0, current)
+            path.append(current)
             current = current.parent_heading
+        path.reverse()
         return path
     
     def get_path_text(self, separator: str = " > ") -> str:
@@ -170,12 +233,60 @@ class Heading:
 
 
 @dataclass
+class HeadingColumns:
+    """
+    Column-wise (structure-of-arrays) view of a list of headings, so sorting,
+    hierarchy validation and metrics run over NumPy arrays instead of
+    per-heading attribute lookups.
+    """
+    texts: List[str]
+    levels: np.ndarray       # int8
+    pages: np.ndarray        # int32
+    confidences: np.ndarray  # float64
+    ys: np.ndarray           # float64, vertical position on the page
+
+    @classmethod
+    def from_headings(cls, headings: List[Heading]) -> 'HeadingColumns':
+        """Gather the fields of a list of headings into columns."""
+        count = len(headings)
+        return cls(
+            texts=[h.text for h in headings],
+            levels=np.fromiter((h.level for h in headings), dtype=np.int8, count=count),
+            pages=np.fromiter((h.page for h in headings), dtype=np.int32, count=count),
+            confidences=np.fromiter((h.confidence for h in headings), dtype=np.float64, count=count),
+            ys=np.fromiter((h.position[1] for h in headings), dtype=np.float64, count=count)
+        )
+
+    def take(self, order: np.ndarray) -> 'HeadingColumns':
+        """Return the columns reordered (or subset) by an index array."""
+        return HeadingColumns(
+            texts=[self.texts[i] for i in order],
+            levels=self.levels[order],
+            pages=self.pages[order],
+            confidences=self.confidences[order],
+            ys=self.ys[order]
+        )
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+
+@dataclass(slots=True)
 class Outline:
     """
     Represents the complete outline structure of a document.
+    
+    The heading fields are also kept as NumPy columns (`columns`), so the
+    statistics and the level/page/confidence queries run as vectorized filters.
+    After adding, removing or reordering headings, or changing a heading's text,
+    level, page, confidence or position, or linking headings with add_child or
+    remove_child, call `invalidate()` so the queries and `to_dict` see the change.
     """
     headings: List[Heading]
     hierarchy: Dict[str, Any] = field(default_factory=dict)
+    # Column view of `headings`, in the same order; built from them unless given.
+    # Keyword-only, so the fields after it keep their positions
+    columns: Optional[HeadingColumns] = field(default=None, kw_only=True)
     
     # Quality metrics
     average_confidence: float = 0.0
@@ -187,23 +298,43 @@ class Outline:
     h2_count: int = 0
     h3_count: int = 0
     
+    # Sorted indexes for the page and confidence queries, built on first use
+    _page_index_cache: Optional[Tuple[np.ndarray, np.ndarray]] = field(default=None, init=False, repr=False, compare=False)
+    _confidence_index_cache: Optional[Tuple[np.ndarray, np.ndarray]] = field(default=None, init=False, repr=False, compare=False)
+    # Bumped by invalidate() and build_tree_structure(), so cached results can tell they are stale
+    _version: int = field(default=0, init=False, repr=False, compare=False)
+    # to_dict() result, and the version, metrics and hierarchy it was built from
+    _dict_cache: Optional[Tuple[Tuple[Any, ...], Dict[str, Any]]] = field(default=None, init=False, repr=False, compare=False)
+    
     def __post_init__(self):
         """Post-initialization processing."""
+        if self.columns is None:
+            self.columns = HeadingColumns.from_headings(self.headings)
+        self._calculate_statistics()
+    
+    def invalidate(self) -> None:
+        """
+        Rebuild the columns and statistics after `headings` or a heading's fields
+        changed, and drop the sorted page and confidence indexes built from the
+        old columns.
+        """
+        self.columns = HeadingColumns.from_headings(self.headings)
+        self._page_index_cache = None
+        self._confidence_index_cache = None
+        self._version += 1
         self._calculate_statistics()
     
     def _calculate_statistics(self) -> None:
         """Calculate outline statistics."""
         self.total_headings = len(self.headings)
         
+        # Count by level (levels are 1-3); all zero for an empty outline
+        level_counts = np.bincount(self.columns.levels, minlength=4)
+        self.h1_count, self.h2_count, self.h3_count = (int(count) for count in level_counts[1:4])
+        
+        # Calculate average confidence
         if self.headings:
-            # Count by level
-            self.h1_count = len([h for h in self.headings if h.level == 1])
-            self.h2_count = len([h for h in self.headings if h.level == 2])
-            self.h3_count = len([h for h in self.headings if h.level == 3])
-            
-            # Calculate average confidence
-            total_confidence = sum(h.confidence for h in self.headings)
-            self.average_confidence = total_confidence / len(self.headings)
+            self.average_confidence = float(self.columns.confidences.mean())
     
     @property
     def is_empty(self) -> bool:
@@ -218,14 +349,18 @@ class Outline:
     @property
     def has_hierarchy(self) -> bool:
         """Check if outline has hierarchical structure."""
-        return len(set(h.level for h in self.headings)) > 1
+        # More than one level with headings, from the level counts
+        return (self.h1_count > 0) + (self.h2_count > 0) + (self.h3_count > 0) > 1
     
     @property
     def max_depth(self) -> int:
         """Get maximum depth of the outline."""
-        if not self.headings:
-            return 0
-        return max(h.level for h in self.headings)
+        # The deepest level with headings, from the level counts
+        if self.h3_count:
+            return 3
+        if self.h2_count:
+            return 2
+        return 1 if self.h1_count else 0
     
     def get_headings_by_level(self, level: int) -> List[Heading]:
         """
@@ -237,7 +372,7 @@ class Outline:
         Returns:
             List of headings at the specified level
         """
-        return [h for h in self.headings if h.level == level]
+        return self._select(self.columns.levels == level)
     
     def get_headings_on_page(self, page: int) -> List[Heading]:
         """
@@ -249,7 +384,10 @@ class Outline:
         Returns:
             List of headings on the specified page
         """
-        return [h for h in self.headings if h.page == page]
+        order, sorted_pages = self._page_index
+        start = np.searchsorted(sorted_pages, page, side='left')
+        end = np.searchsorted(sorted_pages, page, side='right')
+        return [self.headings[i] for i in order[start:end].tolist()]
     
     def get_page_range(self) -> Tuple[int, int]:
         """
@@ -261,8 +399,8 @@ class Outline:
         if not self.headings:
             return (0, 0)
         
-        pages = [h.page for h in self.headings]
-        return (min(pages), max(pages))
+        _, sorted_pages = self._page_index
+        return (int(sorted_pages[0]), int(sorted_pages[-1]))
     
     def get_high_confidence_headings(self, threshold: float = 0.8) -> List[Heading]:
         """
@@ -274,7 +412,9 @@ class Outline:
         Returns:
             List of high-confidence headings
         """
-        return [h for h in self.headings if h.confidence >= threshold]
+        order, sorted_confidences = self._confidence_index
+        split = np.searchsorted(sorted_confidences, threshold, side='left')
+        return [self.headings[i] for i in np.sort(order[split:]).tolist()]
     
     def get_low_confidence_headings(self, threshold: float = 0.5) -> List[Heading]:
         """
@@ -286,7 +426,31 @@ class Outline:
         Returns:
             List of low-confidence headings
         """
-        return [h for h in self.headings if h.confidence < threshold]
+        order, sorted_confidences = self._confidence_index
+        split = np.searchsorted(sorted_confidences, threshold, side='left')
+        return [self.headings[i] for i in np.sort(order[:split]).tolist()]
+    
+    @property
+    def _page_index(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Heading indices stably sorted by page, and the sorted pages, for binary search."""
+        if self._page_index_cache is None:
+            pages = self.columns.pages
+            order = np.argsort(pages, kind='stable')
+            self._page_index_cache = (order, pages[order])
+        return self._page_index_cache
+    
+    @property
+    def _confidence_index(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Heading indices sorted by confidence, and the sorted confidences, for binary search."""
+        if self._confidence_index_cache is None:
+            confidences = self.columns.confidences
+            order = np.argsort(confidences, kind='stable')
+            self._confidence_index_cache = (order, confidences[order])
+        return self._confidence_index_cache
+    
+    def _select(self, mask: np.ndarray) -> List[Heading]:
+        """Return the headings where a boolean mask over the columns is set, in order."""
+        return [self.headings[i] for i in np.flatnonzero(mask).tolist()]
     
     def build_tree_structure(self) -> List[Heading]:
         """
@@ -298,33 +462,28 @@ class Outline:
         if not self.headings:
             return []
         
+        # The children change, so the cached dictionary does too
+        self._version += 1
+        
         # Create a copy of headings to avoid modifying original
         headings = [h for h in self.headings]
         
         # Clear existing parent-child relationships
         for heading in headings:
-            heading.parent_heading = None
+            heading._parent_ref = None
             heading.children = []
+            heading._depth = 0
         
-        # Build tree structure
+        # Build tree structure: find every heading's parent from the level column,
+        # then link them up in order
         root_headings = []
-        stack = []  # Stack of potential parents
+        parents = _parents_from_levels(self.columns.levels)
         
-        for heading in headings:
-            # Find appropriate parent
-            while stack and stack[-1].level >= heading.level:
-                stack.pop()
-            
-            if stack:
-                # Add as child to the last heading in stack
-                parent = stack[-1]
-                parent.add_child(heading)
+        for heading, parent in zip(headings, parents.tolist()):
+            if parent >= 0:
+                headings[parent].add_child(heading)
             else:
-                # This is a root heading
                 root_headings.append(heading)
-            
-            # Add to stack as potential parent for next headings
-            stack.append(heading)
         
         return root_headings
     
@@ -339,24 +498,16 @@ class Outline:
         Returns:
             List of formatted TOC entries
         """
-        toc_entries = []
+        # Select the levels to include over the level column, then format from the columns
+        columns = self.columns
+        selected = np.flatnonzero(columns.levels <= max_level).tolist()
+        pages = columns.pages.tolist()
+        # Levels outside 1-3 (reassigned after construction) get the nearest indent
+        levels = np.clip(columns.levels, 1, len(_TOC_INDENTS)).tolist()
         
-        for heading in self.headings:
-            if heading.level > max_level:
-                continue
-            
-            # Create indentation based on level
-            indent = "  " * (heading.level - 1)
-            
-            # Format entry
-            if include_page_numbers:
-                entry = f"{indent}{heading.text} ... {heading.page}"
-            else:
-                entry = f"{indent}{heading.text}"
-            
-            toc_entries.append(entry)
-        
-        return toc_entries
+        if include_page_numbers:
+            return [f"{_TOC_INDENTS[levels[i] - 1]}{columns.texts[i]} ... {pages[i]}" for i in selected]
+        return [_TOC_INDENTS[levels[i] - 1] + columns.texts[i] for i in selected]
     
     def validate_structure(self) -> List[str]:
         """
@@ -375,21 +526,21 @@ class Outline:
         if not self.has_h1_headings:
             issues.append("No H1 headings found")
         
-        # Check hierarchy consistency
-        prev_level = 0
-        for i, heading in enumerate(self.headings):
-            if heading.level > prev_level + 1:
-                issues.append(f"Heading level jump at position {i}: {heading.text[:50]}")
-            prev_level = heading.level
+        # Check hierarchy consistency (the first heading is compared against level 0)
+        columns = self.columns
+        level_steps = np.diff(columns.levels.astype(np.int16), prepend=0)
+        for i in np.flatnonzero(level_steps > 1).tolist():
+            issues.append(f"Heading level jump at position {i}: {self.headings[i].text[:50]}")
         
-        # Check for very low confidence headings
-        low_confidence = self.get_low_confidence_headings(0.3)
-        if len(low_confidence) > len(self.headings) * 0.5:
+        # Check for very low confidence headings (counted, without building the list)
+        low_confidence_count = np.count_nonzero(columns.confidences < 0.3)
+        if low_confidence_count > len(self.headings) * 0.5:
             issues.append("More than 50% of headings have low confidence")
         
         # Check for reasonable heading distribution
         if self.total_headings > 0:
-            min_page, max_page = self.get_page_range()
+            _, sorted_pages = self._page_index
+            min_page, max_page = int(sorted_pages[0]), int(sorted_pages[-1])
             page_span = max_page - min_page + 1
             if page_span > 0:
                 headings_per_page = self.total_headings / page_span
@@ -400,9 +551,29 @@ class Outline:
         
         return issues
     
+    def to_output_entries(self) -> List[Dict[str, Any]]:
+        """
+        Convert the headings to the {"level": "H1", "text": ..., "page": ...}
+        entries of the JSON output, in bulk from the columns.
+        """
+        columns = self.columns
+        return [{"level": f"H{level}", "text": text, "page": page}
+                for level, text, page in zip(columns.levels.tolist(), columns.texts,
+                                             columns.pages.tolist())]
+    
     def to_dict(self) -> Dict[str, Any]:
-        """Convert outline to dictionary representation."""
-        return {
+        """
+        Convert outline to dictionary representation.
+        
+        The result is cached until the outline is invalidated, its tree rebuilt,
+        or its metrics or hierarchy reassigned, and the same dictionary is returned
+        until then: treat it as read-only.
+        """
+        key = (self._version, self.average_confidence, self.quality_score, id(self.hierarchy))
+        if self._dict_cache is not None and self._dict_cache[0] == key:
+            return self._dict_cache[1]
+        
+        result = {
             'statistics': {
                 'total_headings': self.total_headings,
                 'h1_count': self.h1_count,
@@ -416,6 +587,8 @@ class Outline:
             'hierarchy': self.hierarchy,
             'validation_issues': self.validate_structure()
         }
+        self._dict_cache = (key, result)
+        return result
     
     def __str__(self) -> str:
         """String representation of the outline."""
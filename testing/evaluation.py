@@ -2,9 +2,8 @@
 
 import os
 import logging
-from ingestion import process_documents
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+import ahocorasick
+from ingestion import list_pdfs, process_documents
 
 # NOTE: This is a simplified representation of your golden dataset.
 # In a real-world scenario, you would parse this from the PDF files.
@@ -34,26 +33,49 @@ GOLDEN_DATASET = [
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
+def build_answer_automaton(dataset):
+    """
+    Builds an Aho-Corasick automaton over every golden answer, so a single scan of
+    a chunk reports all the answers it contains.
+    """
+    automaton = ahocorasick.Automaton()
+    for i, item in enumerate(dataset):
+        answer = item["golden_answer"]
+        automaton.add_word(answer, automaton.get(answer, ()) + (i,))
+    automaton.make_automaton()
+    return automaton
+
+
 def calculate_mrr(dataset, vector_store):
     """
     Calculates the Mean Reciprocal Rank for the retrieval system.
     """
     reciprocal_ranks = []
+    automaton = build_answer_automaton(dataset)
+    answers_in_chunk = {}
+
+    # Retrieve the top 5 most relevant documents for all queries in one search (exact
+    # search, so the score reflects the embeddings rather than ANN recall). The queries
+    # are embedded in one batch, and kept out of the on-disk document embedding cache
+    all_retrieved_docs = []
+    if dataset:
+        query_vectors = vector_store.embedding.embed_queries([item["user_goal"] for item in dataset])
+        all_retrieved_docs = vector_store.similarity_search_batch(query_vectors, k=5, exact=True)
     
-    for item in dataset:
+    for item_index, (item, retrieved_docs) in enumerate(zip(dataset, all_retrieved_docs)):
         query = item["user_goal"]
-        golden_answer = item["golden_answer"]
         
         logging.info(f"Evaluating query: '{query}'")
         
-        # Retrieve the top 5 most relevant documents for the query
-        retrieved_docs = vector_store.similarity_search(query, k=5)
-        
         rank = 0
         found = False
         for i, doc in enumerate(retrieved_docs):
             # Check if the golden answer is present in the retrieved chunk
-            if golden_answer in doc.page_content:
+            if doc.page_content not in answers_in_chunk:
+                answers_in_chunk[doc.page_content] = {
+                    idx for _, indices in automaton.iter(doc.page_content) for idx in indices
+                }
+            if item_index in answers_in_chunk[doc.page_content]:
                 rank = i + 1
                 found = True
                 break
@@ -79,14 +101,22 @@ def main():
     logging.info("Starting evaluation...")
     
     # 1. Ingest and process the source documents
-    all_text_chunks = process_documents()
+    all_text_chunks = process_documents(list_pdfs("documents"))
     if not all_text_chunks:
         logging.error("No documents found to process in 'documents' folder. Exiting.")
         return
         
-    # 2. Create the vector store
-    embedding_model = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    vector_store = Chroma.from_texts(texts=all_text_chunks, embedding=embedding_model)
+    # 2. Create the vector store (imported here so the ML stack only loads when needed)
+    from embeddings import load_embedding_model
+    from retrieval import VectorIndex
+
+    embedding_model = load_embedding_model(cache_dir=".cache")
+    vector_store = VectorIndex.from_texts(
+        texts=[chunk.page_content for chunk in all_text_chunks],
+        embedding=embedding_model,
+        metadatas=[chunk.metadata for chunk in all_text_chunks],
+        cache_dir=".cache"
+    )
     
     # 3. Calculate and print the MRR
     logging.info("Calculating MRR...")
@@ -0,0 +1,193 @@
+# test_extractor.py
+
+import os
+import sys
+import random
+import unittest
+from unittest import mock
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import fitz
+from config.settings import Settings
+from models.document import Document, TextBlock, FontInfo
+from extractor import pdf_parser
+from extractor.pdf_parser import PDFParser
+from extractor.heading_detector import HeadingDetector, _ENG_NUMBERING, _ENG_KEYWORD_AUTOMATON
+from extractor.utils import otsu_binarize
+
+
+def scalar_otsu_threshold(gray):
+    """Otsu's threshold by trying every level in turn: the first level with the largest between-class variance."""
+    hist = [0] * 256
+    for value in gray.ravel().tolist():
+        hist[value] += 1
+    total = sum(hist)
+    best_threshold, best_variance = 0, -1.0
+    for threshold in range(256):
+        weight_below = sum(hist[:threshold + 1])
+        weight_above = total - weight_below
+        if weight_below == 0 or weight_above == 0:
+            variance = 0.0
+        else:
+            mean_below = sum(i * hist[i] for i in range(threshold + 1)) / weight_below
+            mean_above = sum(i * hist[i] for i in range(threshold + 1, 256)) / weight_above
+            variance = weight_below * weight_above * (mean_below - mean_above) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = threshold, variance
+    return best_threshold
+
+
+def ocr_words(words):
+    """A pytesseract.image_to_data result for (text, left, top, width, height, line) tuples."""
+    data = {key: [] for key in ("text", "left", "top", "width", "height", "block_num", "par_num", "line_num")}
+    for text, left, top, width, height, line in words:
+        for key, value in zip(("text", "left", "top", "width", "height", "block_num", "par_num", "line_num"),
+                              (text, left, top, width, height, 1, 1, line)):
+            data[key].append(value)
+    return data
+
+
+class TestHeadingScoring(unittest.TestCase):
+    """
+    Tests the column-wise English candidate scoring against scoring block by block.
+    """
+
+    def scalar_scores(self, detector, document):
+        """The original candidate filter and per-block weighted score, best first."""
+        avg_size = document.avg_font_size or 12.0
+        scored = []
+        for block in document.text_blocks:
+            text = block.text.strip()
+            if not text or len(text) > detector.settings.MAX_HEADING_LENGTH: continue
+            if block.font_info.size < avg_size: continue
+            if text.endswith(('.', '!', '?', ';', ':')) and len(text) > 20: continue
+            score = (detector._calculate_font_size_score(block, document) * 0.5 +
+                     detector._calculate_font_style_score(block, document) * 0.3 +
+                     detector._calculate_position_score(block, document) * 0.1 +
+                     detector._calculate_numbering_score(text, _ENG_NUMBERING) * 0.1)
+            if detector._calculate_keyword_score(text, _ENG_KEYWORD_AUTOMATON) > 0:
+                score = min(1.0, score + 0.1)
+            if score >= detector.settings.MIN_HEADING_CONFIDENCE:
+                scored.append((block, score))
+        return sorted(scored, key=lambda x: x[1], reverse=True)
+
+    def test_matches_per_block_scoring(self):
+        """
+        Tests random documents mixing numbered, keyword, sentence and bold blocks.
+        """
+        rng = random.Random(1)
+        texts = ["1. Overview", "2.3 Scope", "A. Terms", "IV. Results", "Chapter 4 Design", "introduction",
+                 "A plain sentence that ends with a period.", "Short.", "  ", "Budget summary", "x" * 200]
+        families = ["Arial", "Arial-Bold", "Helvetica-Black", "Times"]
+        detector = HeadingDetector(Settings())
+        for _ in range(50):
+            blocks = [TextBlock(text=rng.choice(texts), page=rng.randint(1, 2), x=rng.uniform(0, 500), y=rng.uniform(0, 800),
+                                width=rng.uniform(10, 400), height=12.0,
+                                font_info=FontInfo(family=rng.choice(families), size=rng.choice([9.0, 12.0, 14.0, 16.0, 20.0]),
+                                                   flags=0, color="#000000"))
+                      for _ in range(rng.randint(0, 40))]
+            document = Document(filename="doc.pdf", filepath="doc.pdf", page_count=2, text_blocks=blocks,
+                                avg_font_size=12.0, page_dimensions=[(612.0, 792.0), (595.0, 842.0)])
+            actual = detector._score_candidates_english(document)
+            expected = self.scalar_scores(detector, document)
+            self.assertEqual([id(block) for block, _ in actual], [id(block) for block, _ in expected])
+            for (_, score), (_, expected_score) in zip(actual, expected):
+                self.assertAlmostEqual(score, expected_score)
+
+
+class TestOtsuBinarize(unittest.TestCase):
+    """
+    Tests the vectorized Otsu threshold against a scalar search over every level.
+    """
+
+    def test_matches_scalar_threshold_search(self):
+        """
+        Tests random two-tone images, and images with a single gray level.
+        """
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            dark, light = sorted(rng.integers(0, 256, size=2))
+            gray = np.where(rng.random((40, 30)) < 0.3, dark, light) + rng.integers(-20, 21, size=(40, 30))
+            gray = np.clip(gray, 0, 255).astype(np.uint8)
+            threshold = scalar_otsu_threshold(gray)
+            np.testing.assert_array_equal(otsu_binarize(gray), np.where(gray > threshold, 255, 0))
+
+        flat = np.full((8, 8), 128, dtype=np.uint8)
+        np.testing.assert_array_equal(otsu_binarize(flat), np.where(flat > scalar_otsu_threshold(flat), 255, 0))
+
+
+class TestOcrMapping(unittest.TestCase):
+    """
+    Tests that words OCR'd from mosaics and tiles are mapped back to their pages and positions.
+    """
+
+    def setUp(self):
+        # At 72 DPI one rendered pixel is one PDF point
+        self.parser = PDFParser(Settings(OCR_DPI=72, OCR_PREPROCESS=False))
+
+    def test_mosaic_lines_map_to_their_pages(self):
+        """
+        Tests that each stacked image's lines land on its page, offset by the region it shows.
+        """
+        heights = [100, 50, 80]
+        pages = [(page_number, fitz.Rect(10, 20 * page_number, 300, 20 * page_number + height), None,
+                  np.full((height, 290), 255, dtype=np.uint8))
+                 for page_number, height in zip((3, 4, 5), heights)]
+        top, words = 0, []
+        for (page_number, _, _, _), height in zip(pages, heights):
+            words += [(f"word{page_number}a", 5, top + 10, 30, 12, page_number),
+                      (f"word{page_number}b", 40, top + 10, 30, 12, page_number)]
+            top += height + pdf_parser.OCR_PAGE_GAP
+
+        with mock.patch.object(pdf_parser.pytesseract, "image_to_data", return_value=ocr_words(words)) as ocr:
+            blocks = self.parser._ocr_mosaic(pages)
+        self.assertEqual(ocr.call_args[0][0].size, (290, sum(heights) + 2 * pdf_parser.OCR_PAGE_GAP))
+
+        for page_number, clip, _, _ in pages:
+            (block,) = blocks[page_number]
+            self.assertEqual(block.text, f"word{page_number}a word{page_number}b")
+            self.assertEqual((block.x, block.y, block.width, block.height), (clip.x0 + 5, clip.y0 + 10, 65, 12))
+
+    def test_tiled_page_keeps_every_word_once(self):
+        """
+        Tests that an oversized page is OCR'd tile by tile without losing or duplicating words in the overlaps.
+        """
+        rng = random.Random(2)
+        pdf = fitz.open()
+        page = pdf.new_page(width=1500, height=1200)
+        for y in range(20, 1190, 15):
+            x = 10
+            while x < 1400:
+                word = "".join(rng.choice("abcdefgh") for _ in range(rng.randint(2, 9)))
+                page.insert_text((x, y), word, fontsize=11)
+                x += len(word) * 7 + 8
+        expected = sorted(word[4] for word in page.get_text("words"))
+
+        clips = []
+        render = self.parser._render_for_ocr
+
+        def record_render(page, clip=None):
+            clips.append(clip)
+            return render(page, clip)
+
+        def ocr_text_layer(image, config, output_type):
+            # Stand-in for Tesseract: the text-layer words lying wholly inside the last rendered tile
+            clip = clips[-1]
+            return ocr_words((text, round(x0 - clip.x0), round(y0 - clip.y0), round(x1 - x0), round(y1 - y0), round(y0))
+                             for x0, y0, x1, y1, text, *_ in page.get_text("words")
+                             if clip.x0 <= x0 and x1 <= clip.x1 and clip.y0 <= y0 and y1 <= clip.y1)
+
+        with mock.patch.object(pdf_parser, "OCR_TILE_SIZE", 500), mock.patch.object(pdf_parser, "OCR_TILE_OVERLAP", 40), \
+             mock.patch.object(self.parser, "_render_for_ocr", side_effect=record_render), \
+             mock.patch.object(pdf_parser.pytesseract, "image_to_data", side_effect=ocr_text_layer) as ocr:
+            blocks = self.parser._ocr_pages(pdf, [1])[1]
+
+        self.assertGreater(ocr.call_count, 1)
+        self.assertTrue(all(clip.width <= 500 and clip.height <= 500 for clip in clips))
+        self.assertEqual(sorted(word for block in blocks for word in block.text.split()), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
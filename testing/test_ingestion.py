@@ -1,7 +1,10 @@
 # test_ingestion.py
 
+import os
+import tempfile
 import unittest
-from ingestion import clean_text # Import the function we want to test
+from types import SimpleNamespace
+from ingestion import clean_text, fast_split, list_pdfs, chunk_document # Import the functions we want to test
 
 class TestCleanText(unittest.TestCase):
     """
@@ -42,4 +45,112 @@ class TestCleanText(unittest.TestCase):
 
         actual_output = clean_text(messy_input)
 
-        self.assertEqual(actual_output, expected_output)
\ No newline at end of file
+        self.assertEqual(actual_output, expected_output)
+
+
+class TestFastSplit(unittest.TestCase):
+    """
+    A suite of tests for the fast_split function.
+    """
+
+    def test_short_text_is_a_single_chunk(self):
+        """
+        Tests that text shorter than the chunk size is returned unchanged.
+        """
+        self.assertEqual(fast_split("A short page.", size=100, overlap=20), ["A short page."])
+        self.assertEqual(fast_split("", size=100, overlap=20), [])
+
+    def test_chunks_respect_size_and_break_at_sentences(self):
+        """
+        Tests that chunks never exceed the size and end on a sentence boundary when one is available.
+        """
+        text = " ".join(f"Sentence number {i} is here." for i in range(50))
+
+        chunks = fast_split(text, size=100, overlap=20)
+
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+        self.assertTrue(all(chunk.endswith(".") for chunk in chunks))
+        self.assertTrue(all(chunk in text for chunk in chunks))
+
+    def test_consecutive_chunks_overlap(self):
+        """
+        Tests that each chunk starts inside the previous one and the last chunk reaches the end.
+        """
+        text = " ".join(f"word{i}" for i in range(300))
+
+        chunks = fast_split(text, size=100, overlap=30)
+
+        for previous, current in zip(chunks, chunks[1:]):
+            self.assertIn(current.split(" ")[0], previous)
+        self.assertTrue(text.endswith(chunks[-1]))
+
+    def test_hard_splits_text_without_separators(self):
+        """
+        Tests that text with no separators is still split into bounded chunks.
+        """
+        chunks = fast_split("x" * 250, size=100, overlap=20)
+
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+        self.assertEqual(chunks[0], "x" * 100)
+
+
+class TestListPdfs(unittest.TestCase):
+    """
+    A suite of tests for the list_pdfs function.
+    """
+
+    def test_lists_only_pdf_files(self):
+        """
+        Tests that only files with a .pdf extension (any case) are returned.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ("a.pdf", "B.PDF", "notes.txt"):
+                open(os.path.join(directory, name), "w").close()
+            os.mkdir(os.path.join(directory, "folder.pdf"))
+
+            names = sorted(os.path.basename(path) for path in list_pdfs(directory))
+
+        self.assertEqual(names, ["B.PDF", "a.pdf"])
+
+    def test_missing_directory_returns_empty_list(self):
+        """
+        Tests that a missing directory yields no PDFs instead of raising.
+        """
+        self.assertEqual(list_pdfs("/nonexistent/directory"), [])
+
+
+class TestChunkDocument(unittest.TestCase):
+    """
+    A suite of tests for the chunk_document function.
+    """
+
+    def test_chunks_each_page_of_a_parsed_document(self):
+        """
+        Tests that text blocks are joined and cleaned per page, keeping source and page metadata.
+        """
+        blocks = [SimpleNamespace(text=text, page=page, separator="\n") for text, page in
+                  [("1. Introduction", 1), ("Some  body text.", 1), ("Second page", 2)]]
+        document = SimpleNamespace(filename="report.pdf", text_blocks=blocks)
+
+        chunks = chunk_document(document)
+
+        self.assertEqual([chunk.page_content for chunk in chunks],
+                         ["1. Introduction Some body text.", "Second page"])
+        self.assertEqual([chunk.metadata for chunk in chunks],
+                         [{"source": "report.pdf", "page": 1}, {"source": "report.pdf", "page": 2}])
+
+    def test_keeps_words_split_across_spans_together(self):
+        """
+        Tests that spans are joined with the whitespace that separated them on the page.
+        """
+        blocks = [SimpleNamespace(text=text, page=1, separator=separator) for text, separator in
+                  [("Intro", "\n"), ("duction", ""), ("to", " "), ("PDFs", " "), ("Next line", "\n")]]
+        document = SimpleNamespace(filename="report.pdf", text_blocks=blocks)
+
+        chunks = chunk_document(document)
+
+        self.assertEqual([chunk.page_content for chunk in chunks], ["Introduction to PDFs Next line"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,385 @@
+# test_outline.py
+
+import os
+import sys
+import random
+import unittest
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from models.document import FontInfo
+from models.outline import Heading, HeadingColumns, Outline, _parents_from_levels
+from extractor.outline_builder import _validate_levels
+
+FONT = FontInfo(family="Arial", size=12.0, flags=0, color="#000000")
+
+
+def make_heading(rng):
+    return Heading(text=f"Heading {rng.randint(0, 999)}", level=rng.randint(1, 3),
+                   page=rng.randint(1, 8), confidence=rng.random(), font_info=FONT,
+                   position=(72.0, rng.uniform(0, 800)))
+
+
+def random_outline(rng, min_headings=0):
+    return Outline(headings=[make_heading(rng) for _ in range(rng.randint(min_headings, 30))])
+
+
+def scalar_validate_levels(levels):
+    """The per-heading hierarchy validation that `_validate_levels` replaced."""
+    validated, level_stack = [], []
+    for level in levels:
+        if not validated or level == 1:
+            adjusted = 1
+        elif level == 2:
+            adjusted = 2 if 1 in validated else 1
+        elif 2 in level_stack:
+            adjusted = 3
+        else:
+            adjusted = 2 if any(v <= 2 for v in validated) else 1
+        level_stack[:] = [l for l in level_stack if l < adjusted]
+        if adjusted not in level_stack:
+            level_stack.append(adjusted)
+        validated.append(adjusted)
+    return validated
+
+
+def scalar_parents(levels):
+    """Parent index of each heading from the stack loop `_parents_from_levels` replaced."""
+    parents, stack = [], []
+    for i, level in enumerate(levels):
+        while stack and levels[stack[-1]] >= level:
+            stack.pop()
+        parents.append(stack[-1] if stack else -1)
+        stack.append(i)
+    return parents
+
+
+def walked_depth(heading):
+    """Depth by walking up the parent links, as `Heading.depth` originally did."""
+    depth, current = 0, heading.parent_heading
+    while current is not None:
+        depth += 1
+        current = current.parent_heading
+    return depth
+
+
+class TestHeadingColumns(unittest.TestCase):
+    """
+    Tests the column view of a heading list.
+    """
+
+    def test_columns_hold_the_heading_fields_in_order(self):
+        """
+        Tests each column against the heading attributes, and reordering with take.
+        """
+        rng = random.Random(6)
+        headings = [make_heading(rng) for _ in range(20)]
+        columns = HeadingColumns.from_headings(headings)
+        self.assertEqual(len(columns), 20)
+        self.assertEqual(columns.texts, [h.text for h in headings])
+        self.assertEqual(columns.levels.tolist(), [h.level for h in headings])
+        self.assertEqual(columns.pages.tolist(), [h.page for h in headings])
+        self.assertEqual(columns.confidences.tolist(), [h.confidence for h in headings])
+        self.assertEqual(columns.ys.tolist(), [h.position[1] for h in headings])
+
+        order = np.argsort(columns.ys, kind="stable")
+        reordered = columns.take(order)
+        self.assertEqual(reordered.texts, [headings[i].text for i in order])
+        self.assertEqual(reordered.pages.tolist(), [headings[i].page for i in order])
+
+    def test_outline_fields_keep_their_positions(self):
+        """
+        Tests that the keyword-only columns field doesn't shift the positional outline fields.
+        """
+        outline = Outline([], {}, 0.5, 0.7)
+        self.assertEqual((outline.average_confidence, outline.quality_score), (0.5, 0.7))
+        self.assertEqual(len(outline.columns), 0)
+
+
+class TestValidateLevels(unittest.TestCase):
+    """
+    Tests the JIT-compiled hierarchy validation against the scalar state machine it replaced.
+    """
+
+    def test_matches_scalar_validation(self):
+        """
+        Tests random level sequences against the original hierarchy validation.
+        """
+        rng = random.Random(0)
+        for _ in range(500):
+            levels = [rng.randint(1, 3) for _ in range(rng.randint(1, 40))]
+            adjusted = _validate_levels(np.array(levels, dtype=np.int8))
+            self.assertEqual(adjusted.tolist(), scalar_validate_levels(levels))
+
+
+class TestOutputEntries(unittest.TestCase):
+    """
+    Tests the JSON outline entries built from the columns.
+    """
+
+    def test_entries_match_the_headings(self):
+        """
+        Tests the entries against formatting each heading.
+        """
+        rng = random.Random(7)
+        for _ in range(50):
+            outline = random_outline(rng)
+            self.assertEqual(outline.to_output_entries(),
+                             [{"level": f"H{h.level}", "text": h.text, "page": h.page} for h in outline.headings])
+
+
+class TestTableOfContents(unittest.TestCase):
+    """
+    Tests the table of contents built from the columns.
+    """
+
+    def test_out_of_range_levels_get_the_nearest_indent(self):
+        """
+        Tests levels reassigned outside 1-3 after construction.
+        """
+        rng = random.Random(15)
+        outline = Outline(headings=[make_heading(rng) for _ in range(3)])
+        for heading, level in zip(outline.headings, (0, 2, 5)):
+            heading.level = level
+        outline.invalidate()
+        self.assertEqual(outline.get_table_of_contents(max_level=5, include_page_numbers=False),
+                         [outline.headings[0].text, "  " + outline.headings[1].text, "    " + outline.headings[2].text])
+
+
+class TestLevelQueries(unittest.TestCase):
+    """
+    Tests the column-backed level query against filtering the heading list.
+    """
+
+    def test_headings_by_level_match_list_filter(self):
+        """
+        Tests every level on random outlines.
+        """
+        rng = random.Random(2)
+        for _ in range(200):
+            outline = random_outline(rng)
+            for level in (1, 2, 3):
+                self.assertEqual(outline.get_headings_by_level(level),
+                                 [h for h in outline.headings if h.level == level])
+
+    def test_queries_follow_heading_changes(self):
+        """
+        Tests that queries see headings added, removed or edited after construction, once invalidated.
+        """
+        rng = random.Random(3)
+        for _ in range(100):
+            outline = random_outline(rng, min_headings=1)
+            for _ in range(5):
+                action = rng.randrange(3)
+                if action == 0:
+                    outline.headings.append(make_heading(rng))
+                elif action == 1 and outline.headings:
+                    outline.headings.pop(rng.randrange(len(outline.headings)))
+                elif outline.headings:
+                    heading = rng.choice(outline.headings)
+                    heading.level, heading.page, heading.confidence = rng.randint(1, 3), rng.randint(1, 8), rng.random()
+                outline.invalidate()
+                level = rng.randint(1, 3)
+                self.assertEqual(outline.get_headings_by_level(level),
+                                 [h for h in outline.headings if h.level == level])
+
+
+class TestHeadingDepth(unittest.TestCase):
+    """
+    Tests the cached heading depths against walking the parent links.
+    """
+
+    def test_depths_match_parent_walk(self):
+        """
+        Tests depths after building a tree and after attaching a subtree under a new parent.
+        """
+        rng = random.Random(8)
+        for _ in range(50):
+            headings = [make_heading(rng) for _ in range(rng.randint(1, 30))]
+            Outline(headings=headings).build_tree_structure()
+            for heading in headings:
+                self.assertEqual(heading.depth, walked_depth(heading))
+
+            # Moving a root under another heading deepens its whole subtree
+            roots = [h for h in headings if h.parent_heading is None]
+            if len(roots) > 1:
+                roots[-1].add_child(roots[0])
+                for heading in headings:
+                    self.assertEqual(heading.depth, walked_depth(heading))
+
+
+class TestPageAndConfidenceQueries(unittest.TestCase):
+    """
+    Tests the binary-search page and confidence queries against filtering the heading list.
+    """
+
+    def test_queries_match_list_filters(self):
+        """
+        Tests random pages and thresholds on random outlines.
+        """
+        rng = random.Random(4)
+        for _ in range(200):
+            outline = random_outline(rng)
+            headings = outline.headings
+            for _ in range(3):
+                page, threshold = rng.randint(0, 9), rng.random()
+                self.assertEqual(outline.get_headings_on_page(page), [h for h in headings if h.page == page])
+                self.assertEqual(outline.get_high_confidence_headings(threshold),
+                                 [h for h in headings if h.confidence >= threshold])
+                self.assertEqual(outline.get_low_confidence_headings(threshold),
+                                 [h for h in headings if h.confidence < threshold])
+
+    def test_queries_follow_invalidate(self):
+        """
+        Tests that the sorted indexes are rebuilt after headings are edited and the outline invalidated.
+        """
+        rng = random.Random(14)
+        for _ in range(100):
+            outline = random_outline(rng, min_headings=1)
+            outline.get_headings_on_page(1)
+            outline.get_high_confidence_headings()
+            for heading in rng.sample(outline.headings, rng.randint(1, len(outline.headings))):
+                heading.page, heading.confidence = rng.randint(1, 8), rng.random()
+            outline.headings.append(make_heading(rng))
+            outline.invalidate()
+            page, threshold = rng.randint(1, 8), rng.random()
+            self.assertEqual(outline.get_headings_on_page(page), [h for h in outline.headings if h.page == page])
+            self.assertEqual(outline.get_high_confidence_headings(threshold),
+                             [h for h in outline.headings if h.confidence >= threshold])
+
+
+class TestBuildTree(unittest.TestCase):
+    """
+    Tests the JIT-compiled parent search and the tree built from it.
+    """
+
+    def test_parents_from_levels_matches_stack_loop(self):
+        """
+        Tests random level sequences against the original parent-finding stack loop.
+        """
+        rng = random.Random(1)
+        for _ in range(500):
+            levels = [rng.randint(1, 3) for _ in range(rng.randint(0, 40))]
+            parents = _parents_from_levels(np.array(levels, dtype=np.int8))
+            self.assertEqual(parents.tolist(), scalar_parents(levels))
+
+    def test_tree_links_each_heading_to_its_parent(self):
+        """
+        Tests the roots, parents and child order of trees built from random outlines.
+        """
+        rng = random.Random(5)
+        for _ in range(100):
+            headings = [make_heading(rng) for _ in range(rng.randint(1, 30))]
+            roots = Outline(headings=headings).build_tree_structure()
+            parents = scalar_parents([h.level for h in headings])
+            self.assertEqual(roots, [h for h, p in zip(headings, parents) if p == -1])
+            for i, (heading, parent) in enumerate(zip(headings, parents)):
+                self.assertIs(heading.parent_heading, headings[parent] if parent >= 0 else None)
+                self.assertEqual(heading.children, [h for h, p in zip(headings, parents) if p == i])
+
+
+class TestRemoveChild(unittest.TestCase):
+    """
+    Tests removing child headings.
+    """
+
+    def test_removing_a_non_child_does_nothing(self):
+        """
+        Tests that removing a heading that isn't a child leaves both headings unchanged.
+        """
+        rng = random.Random(9)
+        parent, other_parent, child, stranger = (make_heading(rng) for _ in range(4))
+        other_parent.add_child(child)
+        parent.remove_child(child)
+        parent.remove_child(stranger)
+        self.assertIs(child.parent_heading, other_parent)
+        self.assertEqual(other_parent.children, [child])
+        self.assertEqual(parent.children, [])
+
+    def test_removals_keep_siblings_and_depths(self):
+        """
+        Tests sibling order, parent links and depths after removing random children one by one.
+        """
+        rng = random.Random(10)
+        for _ in range(100):
+            headings = [make_heading(rng) for _ in range(rng.randint(1, 30))]
+            Outline(headings=headings).build_tree_structure()
+            for _ in range(5):
+                children = [h for h in headings if h.parent_heading is not None]
+                if not children:
+                    break
+                child = rng.choice(children)
+                parent = child.parent_heading
+                expected_siblings = [h for h in parent.children if h is not child]
+                parent.remove_child(child)
+                self.assertEqual(parent.children, expected_siblings)
+                self.assertIsNone(child.parent_heading)
+                for heading in headings:
+                    self.assertEqual(heading.depth, walked_depth(heading))
+
+
+class TestToDict(unittest.TestCase):
+    """
+    Tests the outline dictionary.
+    """
+
+    def test_to_dict_is_cached_until_the_outline_changes(self):
+        """
+        Tests that to_dict is reused while nothing changes, and rebuilt after edits, tree building and metric updates.
+        """
+        rng = random.Random(11)
+        outline = Outline(headings=[make_heading(rng) for _ in range(5)])
+        result = outline.to_dict()
+        self.assertIs(outline.to_dict(), result)
+
+        outline.headings[0].text = "Edited"
+        outline.headings.append(make_heading(rng))
+        outline.invalidate()
+        result = outline.to_dict()
+        self.assertEqual(result['headings'], [h.to_dict() for h in outline.headings])
+        self.assertEqual(result['statistics']['total_headings'], 6)
+
+        outline.build_tree_structure()
+        self.assertEqual(outline.to_dict()['headings'], [h.to_dict() for h in outline.headings])
+
+        outline.quality_score = 0.75
+        self.assertEqual(outline.to_dict()['statistics']['quality_score'], 0.75)
+
+
+class TestOutlineStatistics(unittest.TestCase):
+    """
+    Tests the outline-wide answers against computing them from the heading list.
+    """
+
+    def test_has_hierarchy_matches_distinct_levels(self):
+        """
+        Tests has_hierarchy against counting the distinct heading levels.
+        """
+        rng = random.Random(12)
+        for _ in range(200):
+            outline = random_outline(rng)
+            self.assertEqual(outline.has_hierarchy, len({h.level for h in outline.headings}) > 1)
+            for heading in rng.sample(outline.headings, len(outline.headings) // 2):
+                heading.level = rng.randint(1, 3)
+            outline.invalidate()
+            self.assertEqual(outline.has_hierarchy, len({h.level for h in outline.headings}) > 1)
+
+    def test_max_depth_and_page_range_match_the_headings(self):
+        """
+        Tests max_depth and get_page_range against the heading levels and pages.
+        """
+        rng = random.Random(13)
+        for _ in range(200):
+            outline = random_outline(rng)
+            pages = [h.page for h in outline.headings]
+            self.assertEqual(outline.max_depth, max((h.level for h in outline.headings), default=0))
+            for heading in outline.headings:
+                heading.level = max(1, heading.level - 1)
+            outline.invalidate()
+            self.assertEqual(outline.max_depth, max((h.level for h in outline.headings), default=0))
+            self.assertEqual(outline.get_page_range(), (min(pages), max(pages)) if pages else (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+# test_retrieval.py
+
+import unittest
+from unittest import mock
+import numpy as np
+import faiss
+
+import retrieval
+from retrieval import VectorIndex, _build_faiss_index, _cosine_scores, topk_cosine
+
+
+def unit_vectors(count, dim, seed):
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def make_index(vectors):
+    """A VectorIndex over `vectors`, with chunk i's text "chunk i" and every third chunk a heading."""
+    texts = [f"chunk {i}" for i in range(len(vectors))]
+    metadatas = [{"kind": "heading" if i % 3 == 0 else "body"} for i in range(len(vectors))]
+    return VectorIndex(_build_faiss_index(vectors), vectors, texts, metadatas, embedding=None)
+
+
+def result_ids(documents):
+    return [int(doc.page_content.split()[1]) for doc in documents]
+
+
+def brute_force_filtered(vectors, query, k, kind):
+    """The k best chunks of one kind, by scoring every matching vector."""
+    ids = np.array([i for i in range(len(vectors)) if (i % 3 == 0) == (kind == "heading")])
+    return ids[np.argsort(-(vectors[ids] @ query), kind="stable")[:k]].tolist()
+
+
+class TestTopkCosine(unittest.TestCase):
+    """
+    Tests the parallel exact scoring against a scalar dot-product loop.
+    """
+
+    def test_cosine_scores_match_scalar_loop(self):
+        """
+        Tests every (query, row) score against a plain Python dot product.
+        """
+        vectors, queries = unit_vectors(40, 16, 0), unit_vectors(3, 16, 1)
+        scores = _cosine_scores(vectors, queries)
+        expected = [[sum(float(a) * float(b) for a, b in zip(row, query)) for row in vectors] for query in queries]
+        np.testing.assert_allclose(scores, expected, rtol=1e-5, atol=1e-6)
+
+    def test_topk_matches_full_sort(self):
+        """
+        Tests that the top-k ids are the k best rows, best first, for k below and above the row count.
+        """
+        vectors, queries = unit_vectors(500, 32, 2), unit_vectors(5, 32, 3)
+        reference = queries @ vectors.T
+        for k in (1, 10, 600):
+            rows = topk_cosine(vectors, queries, k)
+            self.assertEqual(rows.shape, (5, min(k, 500)))
+            for query_scores, row in zip(reference, rows):
+                expected = np.sort(query_scores)[::-1][:len(row)]
+                np.testing.assert_allclose(query_scores[row], expected, rtol=1e-5, atol=1e-6)
+
+
+class TestIndexTiers(unittest.TestCase):
+    """
+    Tests that the FAISS index type follows the corpus size.
+    """
+
+    def test_small_corpora_are_flat_and_large_ones_product_quantized(self):
+        """
+        Tests the flat and HNSW product-quantized tiers, and that PQ needs a dimension the subquantizers divide.
+        """
+        vectors = unit_vectors(1000, 48, 4)
+        with mock.patch.object(retrieval, "FLAT_INDEX_MAX_SIZE", 100), \
+             mock.patch.object(retrieval, "PQ_INDEX_MIN_SIZE", 500), \
+             mock.patch.object(retrieval, "PQ_SUBQUANTIZERS", 8):
+            self.assertIsInstance(_build_faiss_index(vectors[:50]), faiss.IndexFlatIP)
+            self.assertIsInstance(_build_faiss_index(vectors), faiss.IndexHNSWPQ)
+            self.assertNotIsInstance(_build_faiss_index(np.ascontiguousarray(vectors[:, :44])), faiss.IndexHNSWPQ)
+
+    def test_mid_sized_corpora_are_scalar_quantized(self):
+        """
+        Tests the HNSW int8 tier between the flat and PQ tiers, and as the fallback when PQ doesn't fit the dimension.
+        """
+        vectors = unit_vectors(1000, 48, 4)
+        with mock.patch.object(retrieval, "FLAT_INDEX_MAX_SIZE", 100), \
+             mock.patch.object(retrieval, "PQ_INDEX_MIN_SIZE", 500), \
+             mock.patch.object(retrieval, "PQ_SUBQUANTIZERS", 8):
+            self.assertIsInstance(_build_faiss_index(vectors[:300]), faiss.IndexHNSWSQ)
+            self.assertIsInstance(_build_faiss_index(np.ascontiguousarray(vectors[:, :44])), faiss.IndexHNSWSQ)
+
+
+class TestRerank(unittest.TestCase):
+    """
+    Tests the exact rerank of approximate candidates against exact search.
+    """
+
+    def test_approximate_tiers_find_the_exact_neighbours(self):
+        """
+        Tests that the reranked approximate search agrees with exact search on each tier.
+        """
+        vectors, queries = unit_vectors(1000, 48, 5), unit_vectors(20, 48, 6)
+        with mock.patch.object(retrieval, "FLAT_INDEX_MAX_SIZE", 100), \
+             mock.patch.object(retrieval, "PQ_INDEX_MIN_SIZE", 500), \
+             mock.patch.object(retrieval, "PQ_SUBQUANTIZERS", 8):
+            for corpus in (vectors[:50], vectors[:300], vectors):
+                index = make_index(corpus)
+                approximate = index.similarity_search_batch(queries, k=5)
+                exact = index.similarity_search_batch(queries, k=5, exact=True)
+                hits = sum(len(set(result_ids(a)) & set(result_ids(e))) for a, e in zip(approximate, exact))
+                self.assertGreaterEqual(hits / (5 * len(queries)), 0.9)
+
+
+class TestFilteredSearch(unittest.TestCase):
+    """
+    Tests metadata-filtered search against brute force over the matching chunks.
+    """
+
+    def test_filtered_search_matches_brute_force(self):
+        """
+        Tests exact search and the ID-selector search over the whole index, for each kind.
+        """
+        vectors, queries = unit_vectors(600, 32, 7), unit_vectors(10, 32, 8)
+        with mock.patch.object(retrieval, "FLAT_INDEX_MAX_SIZE", 100):
+            index = make_index(vectors)
+            self.assertIsInstance(index.index, faiss.IndexHNSW)
+            for kind in ("heading", "body"):
+                for exact in (True, False):
+                    results = index.similarity_search_batch(queries, k=5, exact=exact, filter={"kind": kind})
+                    hits = 0
+                    for query, documents in zip(queries, results):
+                        self.assertTrue(all(doc.metadata["kind"] == kind for doc in documents))
+                        expected = brute_force_filtered(vectors, query, 5, kind)
+                        if exact:
+                            self.assertEqual(result_ids(documents), expected)
+                        hits += len(set(result_ids(documents)) & set(expected))
+                    self.assertGreaterEqual(hits / (5 * len(queries)), 0.9)
+
+    def test_filter_without_matches_returns_no_results(self):
+        """
+        Tests that a filter no chunk matches gives an empty list per query.
+        """
+        index = make_index(unit_vectors(20, 8, 9))
+        self.assertEqual(index.similarity_search_batch(unit_vectors(2, 8, 10), k=3, filter={"kind": "table"}), [[], []])
+
+    def test_small_subsets_are_searched_exactly(self):
+        """
+        Tests that a subset below the flat-index size gets its own exact index, built once per filter.
+        """
+        vectors, queries = unit_vectors(600, 32, 11), unit_vectors(10, 32, 12)
+        with mock.patch.object(retrieval, "FLAT_INDEX_MAX_SIZE", 300):
+            index = make_index(vectors)  # 200 headings, 400 body chunks
+            for _ in range(2):
+                results = index.similarity_search_batch(queries, k=5, filter={"kind": "heading"})
+                for query, documents in zip(queries, results):
+                    self.assertEqual(result_ids(documents), brute_force_filtered(vectors, query, 5, "heading"))
+            self.assertEqual(len(index._filtered_indexes), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()